@@ -0,0 +1,59 @@
+"""Benchmark of word lookups: the SQLite database against the memory-mapped
+binary dictionary built from it (process_revo --binary_dict).
+
+Usage: python -m benchmarks.bench_lookup --db output/vortaro.db
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+import fire
+from typing import Any
+
+from eo_dicts.binary_dict import BinaryDict, write_binary_dict
+from eo_dicts.compression import decompress, load_dictionary
+from eo_dicts.search import search_word
+from eo_dicts.parser.string_with_format import decode_format
+from eo_dicts.utils import output_dir
+from .bench_parser import measure, print_results
+
+
+def run(
+    db: str = "vortaro.db", lookups: int = 2000, repeat: int = 3, seed: int = 0
+) -> list[dict[str, Any]]:
+    """Looks up `lookups` words of the database, drawn at random, both ways,
+    decoding the definitions and their format spans"""
+    db_filename = os.path.join(output_dir(), db)
+    conn = sqlite3.connect(db_filename)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    dictionary = load_dictionary(cursor)
+    all_words = [row[0] for row in cursor.execute("SELECT word FROM words")]
+    words = random.Random(seed).choices(all_words, k=lookups)
+
+    def sqlite_lookup(word: str) -> list:
+        return [
+            (decompress(row["definition"], dictionary), decode_format(row["format"]))
+            for row in search_word(cursor, word)
+        ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, "vortaro.bin")
+        write_binary_dict(db_filename, filename)
+        with BinaryDict(filename) as binary_dict:
+            results = [
+                measure("lookup[sqlite]", sqlite_lookup, lambda: words, repeat),
+                measure("lookup[binary]", binary_dict.lookup, lambda: words, repeat),
+            ]
+    conn.close()
+    return results
+
+
+def main(db: str = "vortaro.db", lookups: int = 2000, repeat: int = 3, seed: int = 0):
+    "db is relative to output/, absolute paths are kept"
+    print_results(run(db, lookups, repeat, seed))
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
@@ -0,0 +1,157 @@
+"""Micro-benchmarks of the Revo parser on a synthetic corpus.
+
+Usage: python -m benchmarks.bench_parser --articles 200 --depth 2 --langs 20
+"""
+
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+import fire
+from lxml import etree
+from typing import Any, Callable, Sequence
+
+from eo_dicts.parser import revo
+from eo_dicts.parser.string_with_format import (
+    Format,
+    StringWithFormat,
+    expand_tld,
+)
+from .corpus import generate_corpus
+
+
+def parse_without_entities(text: str) -> revo.Art:
+    art = ET.fromstring(text).find("art")
+    assert art is not None
+    return revo.Art(art)
+
+
+def dtds_found() -> bool:
+    try:
+        revo.entities_dict()
+    except OSError:
+        return False
+    return True
+
+
+def article_parser(backend: str = "etree") -> Callable[[str], revo.Art]:
+    if dtds_found():
+        return lambda text: revo.Art(revo.parse_xml(text, backend))
+    if backend == "lxml":
+        parser = revo.make_lxml_parser({})
+        return lambda text: revo.Art(
+            etree.fromstring(text.encode(), parser).find("art")
+        )
+    return parse_without_entities
+
+
+def expand_tld_scan(string: StringWithFormat) -> StringWithFormat:
+    "Previous expand_tld, scanning character by character from every span"
+    if not isinstance(string, StringWithFormat) or not string.format.get(
+        Format.TLD.value
+    ):
+        return string
+    boundaries = " \n:;;.,•?!()[]{}'\"„“"
+    text = string.string
+    new_format = []
+    for start, end in string.format[Format.TLD.value]:
+        for i in range(start, -1, -1):
+            if text[i] in boundaries:
+                break
+            start = i
+        for i in range(end, len(text)):
+            end = i
+            if text[i] in boundaries:
+                break
+        else:
+            end = len(text)
+        new_format.append((start, end))
+
+    string.format[Format.TLD.value] = new_format
+    return string
+
+
+def measure(
+    name: str,
+    func: Callable[[Any], Any],
+    items: Callable[[], Sequence[Any]],
+    repeat: int,
+) -> dict[str, Any]:
+    """Best time of `repeat` runs of func over all the items, plus its memory use.
+    The items are created again before every run, so the nodes don't keep the
+    values cached by a previous run."""
+    best = float("inf")
+    for _ in range(repeat):
+        run_items = items()
+        start = time.perf_counter()
+        for item in run_items:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+
+    run_items = items()
+    tracemalloc.start()
+    for item in run_items:
+        func(item)
+    _, peak = tracemalloc.get_traced_memory()
+    snapshot = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count for stat in snapshot.statistics("filename"))
+
+    return dict(
+        name=name,
+        items=len(run_items),
+        ops_per_s=len(run_items) / best if best else 0.0,
+        us_per_op=1e6 * best / len(run_items) if run_items else 0.0,
+        peak_kib=peak / 1024,
+        retained_blocks=blocks,
+    )
+
+
+def print_results(results: list[dict[str, Any]]) -> None:
+    print(
+        "%-16s %8s %12s %10s %10s %10s"
+        % ("benchmark", "items", "ops/s", "us/op", "peak KiB", "blocks")
+    )
+    for res in results:
+        print(
+            "%-16s %8d %12.1f %10.2f %10.1f %10d"
+            % (
+                res["name"],
+                res["items"],
+                res["ops_per_s"],
+                res["us_per_op"],
+                res["peak_kib"],
+                res["retained_blocks"],
+            )
+        )
+
+
+def run(articles: int = 200, repeat: int = 3, **kwargs) -> list[dict[str, Any]]:
+    corpus = generate_corpus(articles, **kwargs)
+    if not dtds_found():
+        print("Revo DTDs not found, articles are parsed without entities\n")
+    parse = article_parser()
+
+    def drvs() -> list[revo.Node]:
+        return [drv for text in corpus for drv in parse(text).derivations()]
+
+    def texts() -> list[StringWithFormat]:
+        return [drv.to_text() for drv in drvs()]
+
+    return [
+        measure("parse_article", parse, lambda: corpus, repeat),
+        measure("parse[lxml]", article_parser("lxml"), lambda: corpus, repeat),
+        measure("Drv.to_text", lambda drv: drv.to_text(), drvs, repeat),
+        measure("translations", lambda drv: drv.translations(), drvs, repeat),
+        measure("expand_tld", expand_tld, texts, repeat),
+        measure("expand_tld[scan]", expand_tld_scan, texts, repeat),
+    ]
+
+
+def main(articles: int = 200, repeat: int = 3, **kwargs):
+    """Extra options are passed to benchmarks.corpus.ArticleGenerator:
+    seed, drvs, sncs, depth, examples, langs, words_per_sentence"""
+    print_results(run(articles, repeat, **kwargs))
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
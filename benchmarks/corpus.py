@@ -0,0 +1,192 @@
+"""Generator of synthetic Revo articles, so the parser can be benchmarked
+without the revo submodule.
+
+Usage: python -m benchmarks.corpus OUTPUT_DIR --articles 1000
+"""
+
+import os
+import random
+import fire
+from typing import Optional
+
+SYLLABLES = [
+    "ka",
+    "be",
+    "ĉi",
+    "do",
+    "fu",
+    "ga",
+    "ĝe",
+    "hi",
+    "ĵo",
+    "lu",
+    "ma",
+    "ne",
+    "pi",
+    "ro",
+    "su",
+    "ŝa",
+    "te",
+    "vi",
+    "zo",
+    "aŭ",
+]
+ENDINGS = ["o", "a", "i", "e", "ilo", "ejo", "ulo", "eco", "ado", "igi", "iĝi"]
+LANGS = [
+    "en",
+    "es",
+    "de",
+    "fr",
+    "it",
+    "pt",
+    "pl",
+    "ru",
+    "hu",
+    "cs",
+    "nl",
+    "sv",
+    "fi",
+    "da",
+    "ca",
+    "la",
+    "ja",
+    "zh",
+    "ko",
+    "tr",
+]
+FAKOJ = ["ZOO", "BOT", "JUR", "ARKI", "MAT", "MED", "TEKS", "GEOG"]
+
+
+class ArticleGenerator:
+    """Generates Revo-shaped <art> documents.
+
+    depth: 0 only <dif> in <drv>, 1 adds <snc>, 2 adds <subsnc>
+    """
+
+    def __init__(
+        self,
+        seed: int = 1,
+        drvs: int = 4,
+        sncs: int = 3,
+        depth: int = 2,
+        examples: int = 2,
+        langs: int = 10,
+        words_per_sentence: int = 8,
+    ):
+        self.rng = random.Random(seed)
+        self.drvs = drvs
+        self.sncs = sncs
+        self.depth = depth
+        self.examples = examples
+        self.langs = LANGS[:langs]
+        self.words_per_sentence = words_per_sentence
+
+    def root(self) -> str:
+        return "".join(
+            self.rng.choice(SYLLABLES) for _ in range(self.rng.randint(1, 3))
+        )
+
+    def word(self) -> str:
+        return self.root() + self.rng.choice(ENDINGS)
+
+    def sentence(self, tld: bool = False) -> str:
+        words = [self.word() for _ in range(self.words_per_sentence)]
+        if tld:
+            # <tld/> at the start, middle and end of words
+            for pos in self.rng.sample(range(len(words)), min(3, len(words))):
+                words[pos] = self.rng.choice(
+                    ["<tld/>" + words[pos], words[pos][:2] + "<tld/>", "<tld/>o"]
+                )
+        return " ".join(words)
+
+    def ref(self) -> str:
+        word = self.root()
+        tip = self.rng.choice(["vid", "sin", "dif", "ant"])
+        return '<ref tip="%s" cel="%s.0o">%so</ref>' % (tip, word, word)
+
+    def dif(self) -> str:
+        content = self.sentence().capitalize()
+        if self.rng.random() < 0.3:
+            content += " " + self.ref()
+        content += ":"
+        for _ in range(self.examples):
+            content += "\n<ekz>%s.</ekz>" % self.sentence(tld=True)
+        return "<dif>%s</dif>" % content
+
+    def translations(self) -> str:
+        trds = []
+        for lng in self.langs:
+            if self.rng.random() < 0.3:
+                group = ", ".join(
+                    "<trd>%s</trd>" % self.word() for _ in range(self.rng.randint(2, 4))
+                )
+                trds.append('<trdgrp lng="%s">%s</trdgrp>' % (lng, group))
+            else:
+                trds.append('<trd lng="%s">%s</trd>' % (lng, self.word()))
+        return "\n".join(trds)
+
+    def subsnc(self) -> str:
+        return "<subsnc>%s</subsnc>" % self.dif()
+
+    def snc(self, mrk: str) -> str:
+        content = ""
+        if self.rng.random() < 0.3:
+            content += '<uzo tip="fak">%s</uzo>' % self.rng.choice(FAKOJ)
+        content += self.dif()
+        if self.depth >= 2:
+            content += "".join(self.subsnc() for _ in range(self.rng.randint(0, 3)))
+        content += self.translations()
+        return '<snc mrk="%s">%s</snc>' % (mrk, content)
+
+    def drv(self, rad: str, n: int) -> str:
+        mrk = "%s.0%d" % (rad, n)
+        ending = self.rng.choice(ENDINGS)
+        kap = "<kap><tld/>%s</kap>" % ending
+        if self.rng.random() < 0.2:
+            kap = "<kap><tld/>%s, <var><kap><tld/>%s</kap></var></kap>" % (
+                ending,
+                self.rng.choice(ENDINGS),
+            )
+        content = kap
+        if self.rng.random() < 0.3:
+            content += "<gra><vspec>%s</vspec></gra>" % self.rng.choice(["tr", "ntr"])
+        if self.depth == 0:
+            content += self.dif() + self.translations()
+        else:
+            content += "".join(
+                self.snc("%s.%d" % (mrk, m))
+                for m in range(self.rng.randint(1, self.sncs))
+            )
+            if self.rng.random() < 0.5:
+                content += self.translations()
+        if self.rng.random() < 0.2:
+            content += '<rim num="1">%s %s.</rim>' % (self.sentence(), self.ref())
+        return '<drv mrk="%s">%s</drv>' % (mrk, content)
+
+    def article(self, rad: Optional[str] = None) -> str:
+        rad = rad or self.root()
+        drvs = "\n".join(
+            self.drv(rad, n) for n in range(self.rng.randint(1, self.drvs))
+        )
+        return (
+            '<?xml version="1.0"?>\n'
+            '<!DOCTYPE vortaro SYSTEM "../dtd/vokoxml.dtd">\n'
+            '<vortaro>\n<art mrk="$Id: %s.xml$">\n<kap><rad>%s</rad>/o</kap>\n%s\n'
+            "</art>\n</vortaro>\n" % (rad, rad, drvs)
+        )
+
+
+def generate_corpus(num_articles: int, **kwargs) -> list[str]:
+    generator = ArticleGenerator(**kwargs)
+    return [generator.article() for _ in range(num_articles)]
+
+
+def main(output_dir: str, articles: int = 1000, **kwargs):
+    os.makedirs(output_dir, exist_ok=True)
+    for n, article in enumerate(generate_corpus(articles, **kwargs)):
+        with open(os.path.join(output_dir, "art%05d.xml" % n), "w") as f:
+            f.write(article)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
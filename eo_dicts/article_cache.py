@@ -0,0 +1,100 @@
+import os
+import pickle
+import hashlib
+import tempfile
+import functools
+from typing import Any, Optional
+
+from .manifest import file_hash, parser_files
+
+
+@functools.cache
+def parser_version() -> str:
+    "Hash of the parser code and DTDs, computed once per process"
+    digest = hashlib.sha256()
+    for filename in parser_files():
+        digest.update(file_hash(filename).encode())
+    return digest.hexdigest()
+
+
+def cache_key(article_hash: str) -> str:
+    """Content address of a parsed article: the hash of its content (the one
+    of the manifest) plus the parser version"""
+    digest = hashlib.sha256(parser_version().encode())
+    digest.update(article_hash.encode())
+    return digest.hexdigest()
+
+
+# cache directories already warned about
+unwritable_dirs: set[str] = set()
+
+
+def cache_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, key[:2], key + ".pickle")
+
+
+def load(cache_dir: str, key: str) -> Optional[Any]:
+    path = cache_path(cache_dir, key)
+    try:
+        with open(path, "rb") as f:
+            value = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, pickle.UnpicklingError):
+        # truncated or corrupted entry, it will be overwritten
+        return None
+    try:
+        # the modification time is the last use, for the LRU eviction
+        os.utime(path)
+    except OSError:
+        pass
+    return value
+
+
+def store(cache_dir: str, key: str, value: Any) -> None:
+    """The cache is only an optimisation: if it can't be written (read-only or
+    full) the build goes on without it, with a single warning per process"""
+    path = cache_path(cache_dir, key)
+    tmp_path = None
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # written aside so that concurrent workers never read a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if cache_dir not in unwritable_dirs:
+            unwritable_dirs.add(cache_dir)
+            print("Warning: can't write the article cache %s: %s" % (cache_dir, e))
+    except BaseException:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def evict(cache_dir: str, max_size: int) -> int:
+    """Remove the least recently used entries until the cache takes at most
+    `max_size` bytes. Returns the number of entries removed."""
+    entries = []
+    for dirpath, _, filenames in os.walk(cache_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            stat = os.stat(path)
+            entries.append((stat.st_mtime, stat.st_size, path))
+    entries.sort()
+
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in entries:
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,269 @@
+"""Read-only binary dictionary, for lookups without SQLite: the words of the
+database sorted, with the definitions they point to, in a single file that is
+memory-mapped and searched in place.
+
+Layout, all integers little-endian:
+
+    header: magic (8 bytes), number of words, number of definitions (u32)
+    word offsets: u32 per word plus the end, into the words blob
+    word definitions: u32 per word, the index of its definition record
+    definition offsets: u32 per definition plus the end, into the records blob
+    words blob: the UTF-8 words, sorted by their bytes
+    records blob: for every definition, the varints id, article_id and
+        position, then words, mark and definition as a varint length and
+        UTF-8 bytes. The rest of the record are its format spans, for every
+        format type: its id (FORMAT_IDS) and number of spans as varints, then
+        the start and end of every span as u32, which are read in a single
+        step instead of a varint at a time
+
+Sorting by UTF-8 bytes is sorting by code point, the order of SQLite's
+BINARY collation, so a lookup finds the same rows as `WHERE word = ?`."""
+
+import os
+import sys
+import mmap
+import array
+import bisect
+import struct
+import sqlite3
+from typing import Optional, TypedDict, Union
+
+from .compression import decompress, load_dictionary
+from .utils import output_dir
+from .parser.string_with_format import (
+    FORMAT_IDS,
+    FORMAT_NAMES,
+    Spans,
+    decode_format,
+    read_varint,
+    write_varint,
+)
+
+MAGIC = b"VORTARO\x01"
+HEADER = struct.Struct("<8sII")
+
+
+class BinaryEntry(TypedDict):
+    word: str
+    definition_id: int
+    article_id: int
+    words: str
+    mark: str
+    position: int
+    definition: str
+    format: Spans
+
+
+def binary_dict_path(db_filename: str) -> str:
+    "The binary dictionary is written next to the database: vortaro.bin"
+    return os.path.splitext(db_filename)[0] + ".bin"
+
+
+def u32_array(values: list[int]) -> bytes:
+    data = array.array("I", values)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data.tobytes()
+
+
+def u32_values(data: memoryview) -> Union[memoryview, array.array]:
+    "The u32 of data, a view of it on little-endian hosts"
+    if sys.byteorder == "little":
+        return data.cast("I")
+    # big-endian hosts read a swapped copy instead
+    values = array.array("I", data)
+    values.byteswap()
+    return values
+
+
+def encode_record(
+    definition_id: int,
+    article_id: int,
+    position: int,
+    words: str,
+    mark: str,
+    definition: str,
+    format: Spans,
+) -> bytes:
+    out = bytearray()
+    for value in (definition_id, article_id, position):
+        write_varint(out, value)
+    for text in (words, mark, definition):
+        encoded = text.encode()
+        write_varint(out, len(encoded))
+        out += encoded
+    for fmt, spans in format.items():
+        write_varint(out, FORMAT_IDS[fmt])
+        write_varint(out, len(spans))
+        out += u32_array([value for span in spans for value in span])
+    return bytes(out)
+
+
+def decode_spans(view: memoryview, pos: int, end: int) -> Spans:
+    format: Spans = {}
+    while pos < end:
+        format_id, pos = read_varint(view, pos)
+        count, pos = read_varint(view, pos)
+        values = u32_values(view[pos : pos + 8 * count]).tolist()
+        pos += 8 * count
+        format[FORMAT_NAMES[format_id]] = list(zip(values[::2], values[1::2]))
+    return format
+
+
+def write_binary_dict(db_filename: str, filename: str) -> int:
+    """Writes the binary dictionary of the database to filename, with the
+    definitions decompressed. The file is replaced only once it's complete.
+    Returns its size in bytes."""
+    conn = sqlite3.connect(db_filename)
+    try:
+        cursor = conn.cursor()
+        dictionary = load_dictionary(cursor)
+        records = bytearray()
+        definition_offsets = [0]
+        definition_index: dict[int, int] = {}
+        for row in cursor.execute(
+            """
+            SELECT id, article_id, position, words, mark, definition, format
+            FROM definitions ORDER BY id
+            """
+        ):
+            definition_id, article_id, position, words, mark, value, format = row
+            definition_index[definition_id] = len(definition_index)
+            records += encode_record(
+                definition_id,
+                article_id,
+                position,
+                words,
+                mark,
+                decompress(value, dictionary),
+                decode_format(format),
+            )
+            definition_offsets.append(len(records))
+
+        entries = sorted(
+            (word.encode(), word_id, definition_id)
+            for word_id, word, definition_id in cursor.execute(
+                "SELECT id, word, definition_id FROM words"
+            )
+        )
+    finally:
+        conn.close()
+
+    words = bytearray()
+    word_offsets = [0]
+    for word, _, _ in entries:
+        words += word
+        word_offsets.append(len(words))
+
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(entries), len(definition_index)))
+        f.write(u32_array(word_offsets))
+        f.write(u32_array([definition_index[entry[2]] for entry in entries]))
+        f.write(u32_array(definition_offsets))
+        f.write(words)
+        f.write(records)
+    os.replace(tmp_filename, filename)
+    return os.path.getsize(filename)
+
+
+class BinaryDict:
+    """Lookups in a binary dictionary. The file is memory-mapped: the offset
+    tables are views of the mapping and only the fields of the entries found
+    are copied out of it."""
+
+    def __init__(self, filename: str):
+        with open(filename, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.word_count, self.definition_count = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            self.data.close()
+            raise Exception("%s is not a binary dictionary" % filename)
+        self.view = memoryview(self.data)
+        pos = HEADER.size
+        self.word_offsets = u32_values(self.view[pos : pos + 4 * (self.word_count + 1)])
+        pos += 4 * (self.word_count + 1)
+        self.word_definitions = u32_values(self.view[pos : pos + 4 * self.word_count])
+        pos += 4 * self.word_count
+        self.definition_offsets = u32_values(
+            self.view[pos : pos + 4 * (self.definition_count + 1)]
+        )
+        pos += 4 * (self.definition_count + 1)
+        self.words_start = pos
+        self.records_start = pos + self.word_offsets[self.word_count]
+
+    def close(self) -> None:
+        for table in (
+            self.word_offsets,
+            self.word_definitions,
+            self.definition_offsets,
+        ):
+            if isinstance(table, memoryview):
+                table.release()
+        self.view.release()
+        self.data.close()
+
+    def __enter__(self) -> "BinaryDict":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.word_count
+
+    def word_bytes(self, index: int) -> bytes:
+        start = self.words_start
+        return self.data[
+            start + self.word_offsets[index] : start + self.word_offsets[index + 1]
+        ]
+
+    def word_range(self, word: str) -> range:
+        "Indexes of the words equal to word, by binary search"
+        key = word.encode()
+        words = range(self.word_count)
+        start = bisect.bisect_left(words, key, key=self.word_bytes)
+        end = bisect.bisect_right(words, key, lo=start, key=self.word_bytes)
+        return range(start, end)
+
+    def entry(self, index: int) -> BinaryEntry:
+        record = self.word_definitions[index]
+        start = self.records_start + self.definition_offsets[record]
+        end = self.records_start + self.definition_offsets[record + 1]
+        view = self.view
+        definition_id, pos = read_varint(view, start)
+        article_id, pos = read_varint(view, pos)
+        position, pos = read_varint(view, pos)
+        texts = []
+        for _ in range(3):
+            length, pos = read_varint(view, pos)
+            texts.append(str(view[pos : pos + length], "utf-8"))
+            pos += length
+        words, mark, definition = texts
+        return BinaryEntry(
+            word=self.word_bytes(index).decode(),
+            definition_id=definition_id,
+            article_id=article_id,
+            words=words,
+            mark=mark,
+            position=position,
+            definition=definition,
+            format=decode_spans(view, pos, end),
+        )
+
+    def lookup(self, word: str) -> list[BinaryEntry]:
+        "The entries of word, in the order of their words.id"
+        return [self.entry(index) for index in self.word_range(word)]
+
+
+def binary_search(word: str, filename: Optional[str] = None) -> None:
+    filename = filename or os.path.join(output_dir(), "vortaro.bin")
+    if not os.path.exists(filename):
+        raise Exception(
+            "%s not found, build it with process_revo --binary_dict" % filename
+        )
+    with BinaryDict(filename) as binary_dict:
+        for entry in binary_dict.lookup(word):
+            for field, value in entry.items():
+                print("%s: %s" % (field, repr(value)))
+            print("")
@@ -1,6 +1,7 @@
 from . import process_revo
 from .utils import list_languages
-from .search import search_multiple, stats
+from .search import browse, search_multiple, stats
+from .db_size import size_report
 from typing import Optional
 
 
@@ -8,12 +9,33 @@ class Vortaro(object):
     def show_languages(self):
         list_languages()
 
-    def search(self, *words: str):
-        search_multiple(*words)
+    def search(
+        self,
+        *words: str,
+        fts: bool = False,
+        prefix: bool = False,
+        limit: int = 20,
+        lang: Optional[str] = None,
+        binary: bool = False,
+    ):
+        search_multiple(
+            *words, fts=fts, prefix=prefix, limit=limit, lang=lang, binary=binary
+        )
+
+    def browse(self, after: Optional[str] = None, limit: int = 20):
+        browse(after, limit)
 
     def stats(self):
         stats()
 
+    def sizes(
+        self,
+        db: str = "vortaro.db",
+        compare: Optional[str] = None,
+        max_growth: Optional[float] = None,
+    ):
+        size_report(db, compare, max_growth)
+
     def process_revo(
         self,
         word: Optional[str] = None,
@@ -23,6 +45,19 @@ class Vortaro(object):
         verbose: bool = False,
         dry_run: bool = False,
         min_entries_to_include_lang: int = 100,
+        jobs: int = 1,
+        incremental: bool = False,
+        sort_buffer_size: int = 100000,
+        bulk: bool = False,
+        quiet: bool = False,
+        cache: bool = False,
+        cache_size_mb: int = 1024,
+        xml_backend: str = "etree",
+        source: Optional[str] = None,
+        binary_format: bool = False,
+        fts: bool = False,
+        compress: bool = False,
+        binary_dict: bool = False,
     ):
         process_revo.main(
             word,
@@ -32,4 +67,17 @@ class Vortaro(object):
             verbose,
             dry_run,
             min_entries_to_include_lang,
+            jobs,
+            incremental,
+            sort_buffer_size,
+            bulk,
+            quiet,
+            cache,
+            cache_size_mb,
+            xml_backend,
+            source,
+            binary_format,
+            fts,
+            compress,
+            binary_dict,
         )
@@ -0,0 +1,155 @@
+"""Compression of definitions.definition with a preset zlib dictionary, trained
+on the definitions of the database and stored once in it.
+
+A compressed definition is a BLOB with raw deflate data (no zlib header), to
+decode it: zlib.decompressobj(-15, zdict=dictionary). Definitions that don't
+get smaller stay as TEXT."""
+
+import os
+import time
+import zlib
+import shutil
+import sqlite3
+import tempfile
+import collections
+from typing import Iterable, Optional, Union
+
+# zlib only looks back 32 KiB, a longer dictionary would be wasted
+DICTIONARY_SIZE = 32768
+# definitions used to train the dictionary
+TRAINING_SAMPLE = 5000
+
+
+def train_dictionary(texts: Iterable[str], size: int = DICTIONARY_SIZE) -> bytes:
+    """The sequences of 1 to 3 words that save the most bytes over the texts.
+    The best ones go at the end of the dictionary, where the distances to
+    them, and so their references, are the shortest."""
+    counts: collections.Counter[str] = collections.Counter()
+    for text in texts:
+        words = text.split()
+        for n in (1, 2, 3):
+            for i in range(len(words) - n + 1):
+                counts[" ".join(words[i : i + n])] += 1
+
+    chosen = []
+    total = 0
+    for phrase, count in sorted(
+        counts.items(), key=lambda item: (item[1] - 1) * len(item[0]), reverse=True
+    ):
+        if count < 2:
+            break
+        length = len(phrase.encode()) + 1
+        if total + length > size:
+            continue
+        chosen.append(phrase)
+        total += length
+    return " ".join(reversed(chosen)).encode()
+
+
+def compress(text: str, dictionary: bytes) -> Union[str, bytes]:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=dictionary)
+    data = compressor.compress(text.encode()) + compressor.flush()
+    return data if len(data) < len(text.encode()) else text
+
+
+def decompress(value: Union[str, bytes], dictionary: Optional[bytes]) -> str:
+    "Decodes definitions.definition, compressed or not"
+    if not isinstance(value, bytes):
+        return value
+    assert dictionary is not None
+    decompressor = zlib.decompressobj(-15, zdict=dictionary)
+    return (decompressor.decompress(value) + decompressor.flush()).decode()
+
+
+def load_dictionary(cursor: sqlite3.Cursor) -> Optional[bytes]:
+    "The dictionary of the database, None if its definitions aren't compressed"
+    try:
+        cursor.execute("SELECT dictionary FROM compression_dictionary")
+    except sqlite3.OperationalError:
+        return None
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def compress_definitions(cursor: sqlite3.Cursor) -> int:
+    """Compresses the definitions still stored as text, training the
+    dictionary first if the database has none (incremental builds keep it).
+    Returns the number of compressed definitions."""
+    dictionary = load_dictionary(cursor)
+    if dictionary is None:
+        cursor.execute("SELECT COUNT(*) FROM definitions")
+        step = max(1, cursor.fetchone()[0] // TRAINING_SAMPLE)
+        cursor.execute("SELECT definition FROM definitions WHERE id % ? = 0", (step,))
+        dictionary = train_dictionary(row[0] for row in cursor.fetchall())
+        cursor.execute(
+            "CREATE TABLE compression_dictionary (id integer primary key, dictionary blob)"
+        )
+        cursor.execute(
+            "INSERT INTO compression_dictionary (dictionary) VALUES (?)", (dictionary,)
+        )
+
+    rows = cursor.execute(
+        "SELECT id, definition FROM definitions WHERE typeof(definition) = 'text'"
+    ).fetchall()
+    compressed = []
+    for definition_id, definition in rows:
+        value = compress(definition, dictionary)
+        if isinstance(value, bytes):
+            compressed.append((value, definition_id))
+    cursor.executemany("UPDATE definitions SET definition = ? WHERE id = ?", compressed)
+    return len(compressed)
+
+
+def decode_latency(cursor: sqlite3.Cursor, ids: list[int]) -> float:
+    "Mean microseconds to read and decode the definition of each of the ids"
+    dictionary = load_dictionary(cursor)
+    start = time.perf_counter()
+    for definition_id in ids:
+        cursor.execute(
+            "SELECT definition FROM definitions WHERE id = ?", (definition_id,)
+        )
+        decompress(cursor.fetchone()[0], dictionary)
+    return 1e6 * (time.perf_counter() - start) / len(ids) if ids else 0.0
+
+
+def compression_report(db_filename: str, sample: int = 2000) -> dict:
+    """Size of the database and mean time to read a definition, as built and
+    with its definitions decompressed again"""
+    fd, plain_filename = tempfile.mkstemp(
+        dir=os.path.dirname(db_filename), suffix=".tmp"
+    )
+    os.close(fd)
+    try:
+        shutil.copyfile(db_filename, plain_filename)
+        conn = sqlite3.connect(plain_filename)
+        try:
+            cursor = conn.cursor()
+            dictionary = load_dictionary(cursor)
+            rows = cursor.execute("SELECT id, definition FROM definitions").fetchall()
+            cursor.executemany(
+                "UPDATE definitions SET definition = ? WHERE id = ?",
+                [(decompress(value, dictionary), id) for id, value in rows],
+            )
+            cursor.execute("DROP TABLE IF EXISTS compression_dictionary")
+            conn.commit()
+            conn.execute("VACUUM")
+            step = max(1, len(rows) // sample)
+            ids = [row[0] for row in rows[::step]]
+            plain_us = decode_latency(cursor, ids)
+        finally:
+            conn.close()
+        plain_size = os.path.getsize(plain_filename)
+    finally:
+        os.remove(plain_filename)
+
+    conn = sqlite3.connect(db_filename)
+    try:
+        compressed_us = decode_latency(conn.cursor(), ids)
+    finally:
+        conn.close()
+    return dict(
+        plain_bytes=plain_size,
+        compressed_bytes=os.path.getsize(db_filename),
+        plain_us_per_row=round(plain_us, 3),
+        compressed_us_per_row=round(compressed_us, 3),
+    )
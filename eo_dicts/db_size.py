@@ -0,0 +1,256 @@
+"""Size of every table and index of a database, and the difference between
+two builds, to find out what makes the database grow."""
+
+import os
+import re
+import sqlite3
+from typing import Optional, TypedDict
+
+from .utils import output_dir
+
+
+class ObjectSize(TypedDict):
+    name: str
+    # table or index, the shadow tables of FTS5 are tables too
+    type: str
+    table: str
+    pages: int
+    bytes: int
+    # rows of a table, entries of an index
+    rows: int
+    avg_row_bytes: Optional[float]
+
+
+def db_path(db: str) -> str:
+    "Names are relative to the output directory, absolute paths are kept"
+    return os.path.join(output_dir(), db)
+
+
+def index_btree(object_type: str, sql: Optional[str]) -> bool:
+    """Indexes and WITHOUT ROWID tables (like the FTS5 shadow tables) keep
+    their entries in every cell, rowid tables only in the leaf cells"""
+    return object_type == "index" or bool(
+        sql and re.search(r"WITHOUT\s+ROWID\s*$", sql, re.IGNORECASE)
+    )
+
+
+def read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    "SQLite varint: big-endian, 7 bits per byte, the 9th byte has 8"
+    value = 0
+    for i in range(8):
+        byte = data[pos + i]
+        value = (value << 7) | (byte & 0x7F)
+        if byte < 0x80:
+            return value, pos + i + 1
+    return (value << 8) | data[pos + 8], pos + 9
+
+
+def overflow_pages(payload: int, usable: int, table_leaf: bool) -> int:
+    "Overflow pages of a cell, from the payload stored on its page"
+    max_local = usable - 35 if table_leaf else (usable - 12) * 64 // 255 - 23
+    if payload <= max_local:
+        return 0
+    min_local = (usable - 12) * 32 // 255 - 23
+    local = min_local + (payload - min_local) % (usable - 4)
+    if local > max_local:
+        local = min_local
+    return -(-(payload - local) // (usable - 4))
+
+
+def walk_btree(
+    data: bytes, page_size: int, usable: int, root: int
+) -> tuple[int, int, int, int]:
+    """Pages (overflow ones included), payload bytes, leaf cells and cells of
+    the b-tree at page root of the database image data"""
+    pages = payload = leaf_cells = cells = 0
+    stack = [root]
+    while stack:
+        page = stack.pop()
+        pages += 1
+        start = (page - 1) * page_size
+        # the first page starts with the database header
+        header = start + (100 if page == 1 else 0)
+        # 2: interior index, 5: interior table, 10: leaf index, 13: leaf table
+        kind = data[header]
+        count = int.from_bytes(data[header + 3 : header + 5], "big")
+        interior = kind in (2, 5)
+        if interior:
+            stack.append(int.from_bytes(data[header + 8 : header + 12], "big"))
+        else:
+            leaf_cells += count
+        cells += count
+        pointers = header + (12 if interior else 8)
+        for i in range(count):
+            pointer = pointers + 2 * i
+            cell = start + int.from_bytes(data[pointer : pointer + 2], "big")
+            if interior:
+                stack.append(int.from_bytes(data[cell : cell + 4], "big"))
+                cell += 4
+            if kind == 5:
+                # only the child page and a rowid
+                continue
+            size, cell = read_varint(data, cell)
+            payload += size
+            pages += overflow_pages(size, usable, kind == 13)
+    return pages, payload, leaf_cells, cells
+
+
+def btree_stats(
+    cursor: sqlite3.Cursor,
+) -> dict[str, tuple[int, int, int, int, int]]:
+    """What dbstat gives for every b-tree, walking the pages of a copy of the
+    database when SQLite is built without SQLITE_ENABLE_DBSTAT_VTAB"""
+    try:
+        # entries are in the leaf cells of a table, in every cell of an index
+        return {
+            name: (pages, size, payload, leaf_cells, cells)
+            for name, pages, size, payload, leaf_cells, cells in cursor.execute(
+                """
+                SELECT name, COUNT(*), SUM(pgsize), SUM(payload),
+                    SUM(CASE WHEN pagetype = 'leaf' THEN ncell ELSE 0 END),
+                    SUM(ncell)
+                FROM dbstat GROUP BY name
+                """
+            )
+        }
+    except sqlite3.OperationalError:
+        pass
+
+    data = cursor.connection.serialize()
+    page_size = int.from_bytes(data[16:18], "big")
+    if page_size == 1:
+        page_size = 65536
+    # bytes reserved at the end of every page, by extensions
+    usable = page_size - data[20]
+    stats = {}
+    for name, root in cursor.execute(
+        "SELECT name, rootpage FROM sqlite_master WHERE rootpage > 0"
+    ).fetchall():
+        pages, payload, leaf_cells, cells = walk_btree(data, page_size, usable, root)
+        stats[name] = (pages, pages * page_size, payload, leaf_cells, cells)
+    return stats
+
+
+def object_sizes(cursor: sqlite3.Cursor) -> list[ObjectSize]:
+    """Pages, bytes and mean payload per row of every b-tree, from the dbstat
+    virtual table or, without it, walking the b-trees"""
+    objects = cursor.execute(
+        """
+        SELECT name, type, tbl_name, sql FROM sqlite_master
+        WHERE type IN ('table', 'index') AND rootpage > 0
+        """
+    ).fetchall()
+    stats = btree_stats(cursor)
+
+    sizes = []
+    for name, object_type, table, sql in objects:
+        pages, size, payload, leaf_cells, cells = stats.get(name, (0, 0, 0, 0, 0))
+        rows = cells if index_btree(object_type, sql) else leaf_cells
+        sizes.append(
+            ObjectSize(
+                name=name,
+                type=object_type,
+                table=table,
+                pages=pages,
+                bytes=size,
+                rows=rows,
+                avg_row_bytes=round(payload / rows, 1) if rows else None,
+            )
+        )
+    sizes.sort(key=lambda size: (-size["bytes"], size["name"]))
+    return sizes
+
+
+def db_sizes(db_filename: str) -> list[ObjectSize]:
+    conn = sqlite3.connect(db_filename)
+    try:
+        return object_sizes(conn.cursor())
+    finally:
+        conn.close()
+
+
+def diff_sizes(
+    old: list[ObjectSize], new: list[ObjectSize]
+) -> list[tuple[str, int, int, int, int]]:
+    """(name, old bytes, new bytes, old rows, new rows) of the objects whose
+    size or number of rows changed, the biggest growth first. Objects only in
+    one of the builds count as 0 in the other."""
+    old_by_name = {size["name"]: size for size in old}
+    new_by_name = {size["name"]: size for size in new}
+    changes = []
+    for name in old_by_name.keys() | new_by_name.keys():
+        old_size = old_by_name.get(name)
+        new_size = new_by_name.get(name)
+        old_bytes = old_size["bytes"] if old_size else 0
+        new_bytes = new_size["bytes"] if new_size else 0
+        old_rows = old_size["rows"] if old_size else 0
+        new_rows = new_size["rows"] if new_size else 0
+        if old_bytes != new_bytes or old_rows != new_rows:
+            changes.append((name, old_bytes, new_bytes, old_rows, new_rows))
+    changes.sort(key=lambda change: (change[1] - change[2], change[0]))
+    return changes
+
+
+def print_sizes(sizes: list[ObjectSize]) -> None:
+    print(
+        "%-40s %-6s %8s %12s %10s %10s"
+        % ("name", "type", "pages", "bytes", "rows", "bytes/row")
+    )
+    for size in sizes:
+        print(
+            "%-40s %-6s %8s %12s %10d %10s"
+            % (
+                size["name"],
+                size["type"],
+                size["pages"],
+                size["bytes"],
+                size["rows"],
+                "-" if size["avg_row_bytes"] is None else size["avg_row_bytes"],
+            )
+        )
+
+
+def print_diff(changes: list[tuple[str, int, int, int, int]]) -> None:
+    print(
+        "%-40s %12s %12s %12s %8s %10s"
+        % ("name", "old bytes", "new bytes", "change", "%", "rows")
+    )
+    for name, old_bytes, new_bytes, old_rows, new_rows in changes:
+        print(
+            "%-40s %12d %12d %+12d %8s %+10d"
+            % (
+                name,
+                old_bytes,
+                new_bytes,
+                new_bytes - old_bytes,
+                "%+.1f" % (100 * (new_bytes - old_bytes) / old_bytes)
+                if old_bytes
+                else "new",
+                new_rows - old_rows,
+            )
+        )
+
+
+def size_report(
+    db: str, compare: Optional[str] = None, max_growth: Optional[float] = None
+) -> None:
+    """Prints the size of every table and index of db. With compare, prints
+    what changed from that (older) build instead, and fails if the file grew
+    more than max_growth percent."""
+    db_filename = db_path(db)
+    sizes = db_sizes(db_filename)
+    if compare is None:
+        print_sizes(sizes)
+        print("Total: %d bytes" % os.path.getsize(db_filename))
+        return
+
+    old_filename = db_path(compare)
+    print_diff(diff_sizes(db_sizes(old_filename), sizes))
+    old_total = os.path.getsize(old_filename)
+    new_total = os.path.getsize(db_filename)
+    growth = 100 * (new_total - old_total) / old_total
+    print("Total: %d -> %d bytes (%+.1f%%)" % (old_total, new_total, growth))
+    if max_growth is not None and growth > max_growth:
+        raise Exception(
+            "%s grew %.1f%% from %s, more than %s%%" % (db, growth, compare, max_growth)
+        )
@@ -0,0 +1,102 @@
+import os
+import glob
+import json
+import hashlib
+from typing import TypedDict, Optional
+
+from .utils import revo_dir
+
+
+class ArticleManifest(TypedDict):
+    hash: str
+    article_id: int
+    # number of translation groups per language, used to recompute
+    # languages.num_entries without reparsing unchanged articles
+    langs: dict[str, int]
+
+
+class Manifest(TypedDict):
+    inputs: str
+    next_article_id: int
+    articles: dict[str, ArticleManifest]
+
+
+def manifest_filename(db_filename: str) -> str:
+    return os.path.splitext(db_filename)[0] + ".manifest.json"
+
+
+def data_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_hash(filename: str) -> str:
+    with open(filename, "rb") as f:
+        return data_hash(f.read())
+
+
+def parser_files() -> list[str]:
+    """Files that affect how an article is parsed into entries: the DTDs and
+    the parser package, which builds the entries (parser/entries.py). The
+    article cache is keyed on them only, so it survives changes to the code
+    that writes the database."""
+    base_dir = os.path.dirname(__file__)
+    filenames = [
+        os.path.join(revo_dir(), "dtd", "vokosgn.dtd"),
+        os.path.join(revo_dir(), "dtd", "vokourl.dtd"),
+        os.path.join(revo_dir(), "dtd", "vokomll.dtd"),
+    ]
+    filenames += sorted(glob.glob(os.path.join(base_dir, "parser", "*.py")))
+    return filenames
+
+
+def database_files() -> list[str]:
+    "Code that turns the entries into the database"
+    base_dir = os.path.dirname(__file__)
+    return [
+        os.path.join(base_dir, "process_revo.py"),
+        os.path.join(base_dir, "utils.py"),
+        os.path.join(base_dir, "compression.py"),
+    ]
+
+
+def inputs_hash(options: dict) -> str:
+    "Hash of everything besides the articles that affects the generated database"
+    filenames = (
+        parser_files()
+        + database_files()
+        + [
+            os.path.join(revo_dir(), "cfg", "lingvoj.xml"),
+            os.path.join(revo_dir(), "cfg", "fakoj.xml"),
+            os.path.join(revo_dir(), "VERSION"),
+        ]
+    )
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps(options, sort_keys=True).encode())
+    for filename in filenames:
+        digest.update(file_hash(filename).encode())
+    return digest.hexdigest()
+
+
+def article_key(filename: str) -> str:
+    return os.path.basename(filename)
+
+
+def manifest_hash(manifest: Manifest) -> str:
+    """Stored in the database too, to tell whether a manifest is the one of
+    the database next to it"""
+    return data_hash(json.dumps(manifest, ensure_ascii=False, sort_keys=True).encode())
+
+
+def load_manifest(filename: str) -> Optional[Manifest]:
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_manifest(filename: str, manifest: Manifest) -> None:
+    with open(filename + ".tmp", "w") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(filename + ".tmp", filename)
@@ -0,0 +1,92 @@
+"""Parsing of an article into the entries of the database: a definition per
+derivation and an entry per word. The article cache stores these entries, so
+it's keyed on this package and the DTDs, not on the database code."""
+
+from typing import TypedDict
+
+from ..timing import timings
+from . import revo
+from .string_with_format import expand_tld
+
+
+class DefinitionDict(TypedDict):
+    article_id: int
+    word: str
+    mark: str
+    definition: str
+    format: str
+    trads: dict
+    position: int
+    # the words after the first one of a drv share a copy of the definition
+    # without translations, which is stored as a separate row
+    is_copy: bool
+
+
+class EntryDict(TypedDict):
+    article_id: int
+    word: str
+    definition: DefinitionDict
+
+
+def parse_article_text(
+    article: str, filename: str, num_article: int, xml_backend: str = "etree"
+) -> list[EntryDict]:
+    art = None
+    try:
+        with timings.phase("xml"):
+            art_node = revo.parse_xml(article, xml_backend)
+        with timings.phase("tree"):
+            art = revo.Art(art_node)
+    except Exception:
+        print("Error parsing %s" % filename)
+        raise
+
+    found_words = []
+    entries: list[EntryDict] = []
+    has_subart = False
+    drvs = list(art.derivations())
+    for pos, drv in enumerate(drvs, 1):
+        if isinstance(drv, revo.Subart):
+            has_subart = True
+
+        if pos == len(drvs) and has_subart and not drv.kap:
+            # first subart contains the whole article,
+            # so this snc will not be needed
+            continue
+
+        main_word_txt = drv.main_word()
+        found_words.append(main_word_txt)
+        with timings.phase("to_text"):
+            content = drv.to_text()
+        with timings.phase("expand_tld"):
+            content = expand_tld(content)
+        assert "StringWithFormat" not in content.string
+        with timings.phase("translations"):
+            trads = drv.translations()
+
+        definition: DefinitionDict = dict(
+            article_id=num_article,
+            word=main_word_txt,
+            mark=drv.mrk,
+            definition=content.string,
+            format=content.encode_format(),
+            trads=trads,
+            position=pos,
+            is_copy=False,
+        )
+        # note that before inserting the entries will be sorted by 'word'
+        first_word = True
+        for word in main_word_txt.split(", "):
+            word = word.strip()
+            # "definition" dict is shared between entries in this loop
+            entries.append(
+                dict(article_id=num_article, word=word, definition=definition)
+            )
+            if first_word:
+                first_word = False
+                # Avoid duplication of translations
+                definition = definition.copy()
+                definition["trads"] = {}
+                definition["is_copy"] = True
+
+    return entries
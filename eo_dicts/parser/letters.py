@@ -0,0 +1,44 @@
+"""Text helpers used by the parser. They live in the parser package because
+they change what an article is parsed into (see manifest.parser_files)."""
+
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+MAPPING = {
+    "C": "Ĉ",
+    "G": "Ĝ",
+    "H": "Ĥ",
+    "J": "Ĵ",
+    "S": "Ŝ",
+    "U": "Ŭ",
+    "c": "ĉ",
+    "g": "ĝ",
+    "h": "ĥ",
+    "j": "ĵ",
+    "s": "ŝ",
+    "u": "ŭ",
+}
+
+
+def add_hats(word: str) -> str:
+    if not word or len(word) == 1:
+        return word
+    res = ""
+    pos = 0
+    while pos < len(word) - 1:
+        char = word[pos]
+        if char in MAPPING.keys() and word[pos + 1] in ("x", "X"):
+            res += MAPPING[char]
+            pos += 2
+        else:
+            res += char
+            pos += 1
+    if pos == len(word) - 1:
+        res += word[-1]
+    return res
+
+
+def letter_enumerate(iterable: Iterable[T]) -> Iterator[tuple[str, T]]:
+    for n, elem in enumerate(iterable):
+        yield (chr(ord("a") + n), elem)
@@ -1,9 +1,15 @@
 import os.path
+import re
 import fire
+import json
+import hashlib
+import tempfile
 import functools
 import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
 from lxml import etree
-from ..utils import add_hats, letter_enumerate
+from ..utils import output_dir, revo_dir
+from .letters import add_hats, letter_enumerate
 from .string_with_format import StringWithFormat, Format
 from abc import abstractmethod
 from typing import Union, Iterator, Optional, Type, TypeVar, cast
@@ -12,6 +18,10 @@ from typing import Union, Iterator, Optional, Type, TypeVar, cast
 T = TypeVar("T", bound="Node")
 
 
+# skipped while parsing, only their tail text is kept
+IGNORED_TAGS = frozenset(["adm", "bld", "fnt"])
+
+
 def remove_extra_whitespace(string: str) -> str:
     cleaned = " ".join(string.split())
     # Preserve trailing whitespace
@@ -23,6 +33,8 @@ def remove_extra_whitespace(string: str) -> str:
 
 
 class Node:
+    __slots__ = ("parent", "children", "typed_children_cache")
+
     def __init__(
         self, node: ET.Element, extra_info: Optional[dict[str, "Node"]] = None
     ):
@@ -30,13 +42,19 @@ class Node:
             extra_info = {}
         self.parent: Optional["Node"] = extra_info.get("parent")
         self.children: list[Union[str, "Node"]]
+        self.typed_children_cache: Optional[dict[type, list]] = None
         self.parse_children(node, extra_info)
 
     def __repr__(self):
+        slots = [
+            slot
+            for cls in reversed(self.__class__.__mro__)
+            for slot in getattr(cls, "__slots__", ())
+        ]
         keys = " ".join(
-            "{}={}".format(k, repr(v))
-            for k, v in self.__dict__.items()
-            if k != "parent"
+            "{}={}".format(k, repr(getattr(self, k)))
+            for k in slots
+            if k != "parent" and not k.endswith("_cache") and hasattr(self, k)
         )
         return "<%s %s>" % (self.__class__.__name__, keys)
 
@@ -45,11 +63,13 @@ class Node:
         if node.text and node.text.strip():
             self.children.append(remove_extra_whitespace(node.text))
         for child in node:
-            if child.tag in ["adm", "bld", "fnt"]:
+            if child.tag in IGNORED_TAGS:
                 if child.tail and child.tail.strip():
                     self.children.append(remove_extra_whitespace(child.tail))
                 continue
-            tag_class = globals()[child.tag.title()]
+            tag_class = TAG_CLASSES.get(child.tag)
+            if tag_class is None:
+                raise Exception("Unknown tag <%s>" % child.tag)
             extra_info["parent"] = self
             self.children.append(tag_class(child, extra_info))
             if child.tail and child.tail.strip():
@@ -85,6 +105,16 @@ class Node:
                 tag = cast(T, tag)
                 yield tag
 
+    def get_list(self, cls: Type[T]) -> list[T]:
+        "Children of class `cls`, found once per node. Don't modify the list"
+        if self.typed_children_cache is None:
+            self.typed_children_cache = {}
+        children = self.typed_children_cache.get(cls)
+        if children is None:
+            children = [child for child in self.children if child.__class__ is cls]
+            self.typed_children_cache[cls] = children
+        return children
+
     def get_except(self, *args: Type["Node"]) -> Iterator[Union[str, "Node"]]:
         for tag in self.children:
             if tag.__class__ not in args:
@@ -125,43 +155,55 @@ class Node:
 
     def translations(self) -> dict[str, dict[str, dict[Optional[int], list[str]]]]:
         trds: dict[str, dict[str, dict[Optional[int], list[str]]]] = {}
-        for tag in self.get_recursive(Trd, Trdgrp):
-            if not isinstance(tag.parent, (Drv, Snc)):
-                continue
+        snc_index = None
+        if isinstance(self, Snc) and isinstance(self.parent, Drv):
+            sncs = self.parent.get_list(Snc)
+            if len(sncs) > 1:
+                snc_index = sncs.index(self) + 1
+        self.collect_translations(trds, snc_index)
+        return trds
 
-            # N° of snc inside the Drv
+    def collect_translations(
+        self,
+        trds: dict[str, dict[str, dict[Optional[int], list[str]]]],
+        snc_index: Optional[int],
+    ) -> None:
+        "Adds the translations of the subtree to `trds` in one walk, in document order"
+        drv: Optional[Drv] = None
+        many_sncs = False
+        if isinstance(self, Drv):
+            drv = self
             snc_index = None
-            if isinstance(tag.parent, Snc):
-                if not isinstance(tag.parent.parent, Drv):
-                    # TODO check if we are missing something
-                    # example: -ad (ad.xml and subdrv)
+            # N° of snc inside the Drv, only when there is more than one
+            many_sncs = len(self.get_list(Snc)) > 1
+        elif isinstance(self, Snc) and isinstance(self.parent, Drv):
+            drv = self.parent
+        # TODO check if we are missing something in other nodes
+        # example: -ad (ad.xml and subdrv)
+
+        n_snc = 0
+        # Tld has no children
+        for child in getattr(self, "children", ()):
+            if isinstance(child, str):
+                continue
+            if isinstance(child, (Trd, Trdgrp)):
+                if drv is None:
                     continue
-                drv = tag.parent.parent
-                main_word = drv.main_word()
-
-                sncs = [t for t in drv.children if isinstance(t, Snc)]
-                # If there is only one Snc we don't need to specify a snc_index
-                if len(sncs) > 1:
-                    snc_index = sncs.index(tag.parent) + 1
+                lng, texts = child.parse_trd()
+                if isinstance(texts, str):
+                    texts = [texts]
+                by_lang = trds.setdefault(drv.main_word(), {})
+                by_lang.setdefault(lng, {})[snc_index] = texts
+            elif isinstance(child, Snc):
+                n_snc += 1
+                child.collect_translations(trds, n_snc if many_sncs else None)
             else:
-                main_word = tag.parent.main_word()
-            if main_word not in trds:
-                trds[main_word] = {}
-
-            if not isinstance(tag, (Trd, Trdgrp)):
-                raise
-            lng, texts = tag.parse_trd()
-            if isinstance(texts, str):
-                texts = [texts]
-
-            if lng not in trds[main_word]:
-                trds[main_word][lng] = {}
-            trds[main_word][lng][snc_index] = texts
-
-        return trds
+                child.collect_translations(trds, None)
 
 
 class TextNode(Node):
+    __slots__ = ()
+
     # Format enum, can also be a list
     base_format: Union[list[Format], Format, None] = None
 
@@ -185,6 +227,8 @@ class TextNode(Node):
 
 
 class Art(Node):
+    __slots__ = ("kap",)
+
     def __init__(self, node: ET.Element, extra_info=None):
         if extra_info is None:
             extra_info = {}
@@ -200,48 +244,54 @@ class Art(Node):
         super().__init__(node, extra_info)
 
     def derivations(self) -> Iterator[Union["Subart", "Drv"]]:
-        for subart in self.get(Subart):
+        for subart in self.get_list(Subart):
             for drv in subart.derivations():
                 yield drv
-        for drv in self.get(Drv):
+        for drv in self.get_list(Drv):
             yield drv
-        assert not list(self.get(Snc))
+        assert not self.get_list(Snc)
 
     def to_text(self):
         raise Exception("Do not use Art.to_text() directly")
 
 
 class Kap(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Rad(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Gra(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Mlg(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Vspec(TextNode):
+    __slots__ = ()
+
     def to_text(self) -> StringWithFormat:
         return StringWithFormat("(").add(super().to_text()).add(")")
 
 
 class Ofc(TextNode):
+    __slots__ = ()
+
     def to_text(self) -> StringWithFormat:
         return StringWithFormat("")
 
 
 class Var(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Subart(TextNode):
+    __slots__ = ("mrk", "kap")
+
     def __init__(self, node: ET.Element, extra_info=None):
         super().__init__(node, extra_info)
         self.mrk = ""
@@ -249,7 +299,7 @@ class Subart(TextNode):
 
     def derivations(self) -> Iterator[Union["Subart", "Drv"]]:
         # Note that this method sometimes will return the subart node
-        drvs = list(self.get(Drv))
+        drvs = self.get_list(Drv)
         if len(drvs) == 1:
             self.kap = drvs[0].kap
             self.mrk = drvs[0].mrk
@@ -261,26 +311,36 @@ class Subart(TextNode):
                     self.mrk = drv.mrk
                 yield drv
         # al.xml, last <subart> has <snc> as a direct child
-        if not drvs and list(self.get(Snc)):
+        if not drvs and self.get_list(Snc):
             yield self
 
 
 class Drv(Node):
+    __slots__ = ("mrk", "kap", "main_word_cache", "text_cache")
+
     def __init__(self, node: ET.Element, extra_info=None):
         self.mrk = node.get("mrk") or ""
         if not extra_info:
             extra_info = {}
         kap_node = node.find("kap")
         assert kap_node is not None
-        kap = Kap(kap_node, extra_info)
+        # a copy, so that parsing the kap doesn't change the parent of the drv
+        kap = Kap(kap_node, dict(extra_info))
         self.kap = kap.to_text().string
+        self.main_word_cache: Optional[str] = None
+        self.text_cache: Optional[StringWithFormat] = None
         super().__init__(node, extra_info)
-        self.parse_children(node, extra_info)
+
+    def main_word(self) -> str:
+        if self.main_word_cache is None:
+            self.main_word_cache = super().main_word()
+        return self.main_word_cache
 
     def read_snc(self) -> list[StringWithFormat]:
         meanings = []
-        n_sncs = len(list(self.get(Snc)))
-        for n, snc in enumerate(self.get(Snc)):
+        sncs = self.get_list(Snc)
+        n_sncs = len(sncs)
+        for n, snc in enumerate(sncs):
             if n_sncs > 1:
                 text = StringWithFormat("%s. " % (n + 1,))
                 text += snc.to_text()
@@ -290,6 +350,12 @@ class Drv(Node):
         return meanings
 
     def to_text(self) -> StringWithFormat:
+        # rendered once, the callers get a copy they can modify
+        if self.text_cache is None:
+            self.text_cache = self.render()
+        return self.text_cache.copy()
+
+    def render(self) -> StringWithFormat:
         content = StringWithFormat()
 
         # Kap and Fnt ignored
@@ -302,7 +368,7 @@ class Drv(Node):
 
         meanings = self.read_snc()
 
-        for nn, subdrv in letter_enumerate(self.get(Subdrv)):
+        for nn, subdrv in letter_enumerate(self.get_list(Subdrv)):
             text = subdrv.to_text()
             text.prepend("%s. " % nn.upper())
             if nn == "a" and (meanings or len(content)):
@@ -325,9 +391,7 @@ class Drv(Node):
 
 
 class Subdrv(Node):
-    def __init__(self, node: ET.Element, extra_info=None):
-        super().__init__(node, extra_info)
-        self.parse_children(node, extra_info)
+    __slots__ = ()
 
     def to_text(self) -> StringWithFormat:
         content = StringWithFormat()
@@ -338,7 +402,7 @@ class Subdrv(Node):
                 continue
             content += node.to_text()
 
-        for n, snc in enumerate(self.get(Snc), 1):
+        for n, snc in enumerate(self.get_list(Snc), 1):
             text = snc.to_text()
             text.prepend("%s. " % n)
             text.prepend("\n\n")
@@ -354,6 +418,8 @@ class Subdrv(Node):
 
 
 class Snc(Node):
+    __slots__ = ("mrk",)
+
     def __init__(self, node, extra_info=None):
         self.mrk = node.get("mrk")
         if not extra_info:
@@ -373,10 +439,10 @@ class Snc(Node):
             if isinstance(node, Gra):
                 content += " "
 
-        if list(self.get(Subsnc)):
+        if self.get_list(Subsnc):
             content += "\n\n"
             subs = []
-            for n, subsnc in letter_enumerate(self.get(Subsnc)):
+            for n, subsnc in letter_enumerate(self.get_list(Subsnc)):
                 text = subsnc.to_text()
                 text.prepend("%s) " % n)
                 subs.append(text)
@@ -396,17 +462,20 @@ class Snc(Node):
 
 
 class Subsnc(TextNode):
+    __slots__ = ("mrk",)
+
     def __init__(self, node: ET.Element, extra_info=None):
         super().__init__(node, extra_info)
         self.mrk = node.get("mrk")
 
 
 class Uzo(TextNode):
+    __slots__ = ("tip", "base_format")
+
     def __init__(self, node: ET.Element, extra_info=None):
         super().__init__(node, extra_info)
         self.tip = node.get("tip")
-        if self.tip == "fak":
-            self.base_format = Format.UZO_FAKO
+        self.base_format = Format.UZO_FAKO if self.tip == "fak" else None
 
     def to_text(self) -> StringWithFormat:
         text = super().to_text()
@@ -427,25 +496,29 @@ class Uzo(TextNode):
 
 
 class Dif(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Tezrad(Node):
+    __slots__ = ()
+
     def to_text(self) -> StringWithFormat:
         return StringWithFormat("")
 
 
 # TODO link to url
 class Url(TextNode):
-    pass
+    __slots__ = ()
 
 
 # TODO link
 class Lstref(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Trd(TextNode):
+    __slots__ = ("lng",)
+
     def __init__(self, node: ET.Element, extra_info=None):
         super().__init__(node, extra_info)
         self.lng = node.get("lng") or ""
@@ -457,10 +530,15 @@ class Trd(TextNode):
         return StringWithFormat("")
 
     def parse_trd(self) -> tuple[str, str]:
+        # most translations are plain text, no need to render them
+        if all(isinstance(child, str) for child in self.children):
+            return (self.lng, "".join(cast(list[str], self.children)))
         return (self.lng, super().to_text().string)
 
 
 class Trdgrp(Node):
+    __slots__ = ("lng",)
+
     def __init__(self, node: ET.Element, extra_info=None):
         self.lng = node.get("lng") or ""
         super().__init__(node, extra_info)
@@ -473,6 +551,8 @@ class Trdgrp(Node):
 
 
 class Ref(TextNode):
+    __slots__ = ("tip",)
+
     @staticmethod
     def add_arrow(tip: Optional[str], text: StringWithFormat) -> StringWithFormat:
         if not tip:
@@ -504,6 +584,8 @@ class Ref(TextNode):
 
 
 class Refgrp(TextNode):
+    __slots__ = ("tip",)
+
     def __init__(self, node: ET.Element, extra_info=None):
         super().__init__(node, extra_info)
         self.tip = node.get("tip")
@@ -515,10 +597,11 @@ class Refgrp(TextNode):
 
 
 class Sncref(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Ekz(TextNode):
+    __slots__ = ()
     base_format = Format.EKZ
 
     def to_text(self) -> StringWithFormat:
@@ -528,6 +611,8 @@ class Ekz(TextNode):
 
 
 class Tld(Node):
+    __slots__ = ("radix", "lit")
+
     def __init__(self, node: ET.Element, extra_info=None):
         self.radix = ""
         self.lit = node.get("lit") or ""
@@ -551,10 +636,12 @@ class Tld(Node):
 
 # found in amik.xml
 class Klr(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Rim(TextNode):
+    __slots__ = ("num",)
+
     def __init__(self, node: ET.Element, extra_info=None):
         super().__init__(node, extra_info)
         self.num = node.get("num") or ""
@@ -569,124 +656,262 @@ class Rim(TextNode):
 
 
 class Aut(TextNode):
+    __slots__ = ()
+
     def to_text(self) -> StringWithFormat:
         return StringWithFormat("[").add(super().to_text()).add("]")
 
 
 class Fnt(Node):
+    __slots__ = ()
+
     def to_text(self) -> StringWithFormat:
         return StringWithFormat("")
 
 
 # found in zon.xml
 class Frm(TextNode):
-    pass
+    __slots__ = ()
 
 
 # TODO sub format (seen en acetil.xml)
 class Sub(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Sup(TextNode):
-    pass
+    __slots__ = ()
 
 
 class K(TextNode):
-    pass
+    __slots__ = ()
 
 
 class G(TextNode):
-    pass
+    __slots__ = ()
 
 
 # TODO bold format (example: abstrakta)
 class Em(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Ctl(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Ind(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Mll(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Nom(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Esc(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Nac(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Baz(TextNode):
-    pass
+    __slots__ = ()
 
 
 # seen in dank.xml, danke al
 class Mis(TextNode):
-    pass
+    __slots__ = ()
 
 
 # TODO strikethrough
 class Ts(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Pr(TextNode):
-    pass
+    __slots__ = ()
 
 
 class Ke(TextNode):
-    pass
+    __slots__ = ()
+
+
+def node_classes(cls: type) -> Iterator[type]:
+    subclasses: list[type] = cls.__subclasses__()
+    for subclass in subclasses:
+        yield subclass
+        yield from node_classes(subclass)
+
+
+# tag -> class of its node, e.g. "trdgrp" -> Trdgrp
+TAG_CLASSES: dict[str, Type[Node]] = {
+    cls.__name__.lower(): cast(Type[Node], cls)
+    for cls in node_classes(Node)
+    if cls is not TextNode
+}
+
+
+DTD_FILES = ["vokosgn.dtd", "vokourl.dtd", "vokomll.dtd"]
+# part of the key of the compiled entities, to increase when compile_entities
+# gives a different table for the same DTDs
+ENTITIES_VERSION = 1
+# handled by the XML parser itself
+XML_ENTITIES = frozenset(["amp", "lt", "gt", "quot", "apos"])
+ENTITY_RE = re.compile(r"&([A-Za-z_][\w.\-]*);")
 
 
 # https://github.com/sstangl/tuja-vortaro/blob/master/revo/convert-to-js.py
-@functools.cache
-def entities_dict() -> dict[str, str]:
+def compile_entities(dtd_dir: str) -> dict[str, str]:
     entities: dict[str, str] = {}
+    for dtd_file in DTD_FILES:
+        with open(os.path.join(dtd_dir, dtd_file), "rb") as f:
+            dtd = etree.DTD(f)
+            for entity in dtd.iterentities():
+                entities[entity.name] = entity.content
+    return entities
 
-    base_dir = os.path.join(os.path.dirname(__file__), "..", "..", "revo", "dtd")
-    with open(os.path.join(base_dir, "vokosgn.dtd"), "rb") as f:
-        dtd = etree.DTD(f)
-        for entity in dtd.iterentities():
-            entities[entity.name] = entity.content
-
-    with open(os.path.join(base_dir, "vokourl.dtd"), "rb") as f:
-        dtd = etree.DTD(f)
-        for entity in dtd.iterentities():
-            entities[entity.name] = entity.content
-
-    with open(os.path.join(base_dir, "vokomll.dtd"), "rb") as f:
-        dtd = etree.DTD(f)
-        for entity in dtd.iterentities():
-            entities[entity.name] = entity.content
+
+def dtd_hash(dtd_dir: str) -> str:
+    digest = hashlib.sha256()
+    for dtd_file in DTD_FILES:
+        with open(os.path.join(dtd_dir, dtd_file), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def load_entities(dtd_dir: str, filename: str) -> dict[str, str]:
+    """Entities of the DTDs, from the compiled table in `filename` while the
+    DTDs and ENTITIES_VERSION don't change. Parsing the DTDs is much slower
+    than loading the JSON. If the table can't be written, the entities are
+    compiled again by every process."""
+    digest = dtd_hash(dtd_dir)
+    try:
+        with open(filename) as f:
+            compiled = json.load(f)
+        if compiled["version"] == ENTITIES_VERSION and compiled["dtd_hash"] == digest:
+            return compiled["entities"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    entities = compile_entities(dtd_dir)
+    tmp_filename = None
+    try:
+        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        # several worker processes can compile it at the same time
+        fd, tmp_filename = tempfile.mkstemp(
+            dir=os.path.dirname(filename), suffix=".tmp"
+        )
+        with os.fdopen(fd, "w") as f:
+            json.dump(
+                dict(version=ENTITIES_VERSION, dtd_hash=digest, entities=entities),
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_filename, filename)
+    except OSError as e:
+        print("Warning: can't write %s: %s" % (filename, e))
+        if tmp_filename and os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
     return entities
 
 
-def parse_article(filename: str) -> Art:
+@functools.cache
+def entities_dict() -> dict[str, str]:
+    return load_entities(
+        os.path.join(revo_dir(), "dtd"),
+        os.path.join(output_dir(), "cache", "entities.json"),
+    )
+
+
+@functools.cache
+def escaped_entities() -> dict[str, str]:
+    "Entity values as they have to be written in the XML to be read as text"
+    return {
+        name: escape(value, {'"': "&quot;"})
+        for name, value in entities_dict().items()
+        if name not in XML_ENTITIES
+    }
+
+
+def resolve_entities(article: str, entities: dict[str, str]) -> str:
+    "Replace the references to the DTD entities, unknown ones are kept"
+    return ENTITY_RE.sub(lambda match: entities.get(match[1], match[0]), article)
+
+
+def entity_dtd(entities: dict[str, str]) -> str:
+    "DTD declaring the entities, whose values are read as text and not markup"
+    # character references are expanded when the declaration is read, so & and <
+    # are escaped twice to reach the document as text
+    replacements = {"&": "&#38;#38;", "<": "&#38;#60;", "%": "&#37;", '"': "&#34;"}
+    return "".join(
+        '<!ENTITY %s "%s">\n'
+        % (name, "".join(replacements.get(char, char) for char in value))
+        for name, value in entities.items()
+        if name not in XML_ENTITIES
+    )
+
+
+class EntityResolver(etree.Resolver):
+    "Serves the DTD of the entities in place of the DTD of the DOCTYPE"
+
+    def __init__(self, dtd: str):
+        super().__init__()
+        self.dtd = dtd
+
+    def resolve(self, system_url, public_id, context):
+        return self.resolve_string(self.dtd, context)
+
+
+def make_lxml_parser(entities: dict[str, str]) -> etree.XMLParser:
+    parser = etree.XMLParser(
+        load_dtd=True,
+        resolve_entities=True,
+        no_network=True,
+        remove_comments=True,
+        remove_pis=True,
+    )
+    parser.resolvers.add(EntityResolver(entity_dtd(entities)))
+    return parser
+
+
+@functools.cache
+def lxml_parser() -> etree.XMLParser:
+    "Reused for every article of the process"
+    return make_lxml_parser(entities_dict())
+
+
+def read_article(filename: str) -> str:
     with open(filename) as f:
-        article = f.read()
+        return f.read()
 
-    xml_parser = ET.XMLParser()
-    for entity, value in entities_dict().items():
-        xml_parser.entity[entity] = value
-    tree = ET.fromstring(article, parser=xml_parser)
+
+def parse_xml(article: str, backend: str = "etree") -> ET.Element:
+    """Parse the XML of an article, returns its <art> element.
+
+    etree: the entities are replaced in the text, instead of being registered
+    in a new parser per file. lxml: the entities are resolved by the parser,
+    both give the same tree"""
+    if backend == "etree":
+        tree = ET.fromstring(resolve_entities(article, escaped_entities()))
+    elif backend == "lxml":
+        tree = etree.fromstring(article.encode(), lxml_parser())
+    else:
+        raise Exception("Unknown XML backend: %s" % backend)
 
     art = tree.find("art")
-    if not art:
+    if art is None:
         raise Exception("XML file does not contain <art> tag!")
-    return Art(art)
+    return art
+
+
+def parse_article(filename: str, backend: str = "etree") -> Art:
+    return Art(parse_xml(read_article(filename), backend))
 
 
 def main(word: str):
@@ -15,11 +15,138 @@ class Format(Enum):
     UZO_FAKO = "fako"
 
 
+# Characters that end the word of a tld
+BOUNDARIES = frozenset(" \n:;;.,•?!()[]{}'\"„“")
+
+# Ids of the format types in the binary encoding, they must never change
+FORMAT_IDS = {
+    Format.ITALIC.value: 0,
+    Format.BOLD.value: 1,
+    Format.EKZ.value: 2,
+    Format.TLD.value: 3,
+    Format.UZO_FAKO.value: 4,
+}
+FORMAT_NAMES = {format_id: fmt for fmt, format_id in FORMAT_IDS.items()}
+
+Spans = dict[str, list[tuple[int, int]]]
+
+
+def encode_format_text(format: Spans) -> str:
+    "One line per type, like `ekz:27,58` and `tld:27,29;35,37`"
+    encoded = []
+    for fmt, values in format.items():
+        tmp_list = ["%s,%s" % item for item in values]
+        encoded.append("%s:%s" % (fmt, ";".join(tmp_list)))
+    return "\n".join(encoded)
+
+
+def decode_format_text(text: str) -> Spans:
+    format: Spans = {}
+    for line in text.split("\n") if text else []:
+        fmt, _, values = line.partition(":")
+        spans = format[fmt] = []
+        for value in values.split(";") if values else []:
+            start, _, end = value.partition(",")
+            spans.append((int(start), int(end)))
+    return format
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    "Unsigned LEB128: 7 bits per byte, the high bit set on all but the last byte"
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data: Union[bytes, memoryview], pos: int) -> tuple[int, int]:
+    "Returns the value and the position after it"
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def zigzag(value: int) -> int:
+    "Maps signed to unsigned ints, small in absolute value stay small: 0, -1, 1..."
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value: int) -> int:
+    return value >> 1 if not value & 1 else -(value >> 1) - 1
+
+
+def encode_format_binary(format: Spans) -> bytes:
+    """Compact encoding of the format spans, a sequence of varints. For every
+    format type:
+
+        type id (FORMAT_IDS), number of spans,
+        then for every span: zigzag(start - end of the previous span),
+                             zigzag(end - start)
+
+    The end of the previous span is 0 for the first span of every type. Spans
+    are mostly in order and short, so most values take a single byte."""
+    out = bytearray()
+    for fmt, values in format.items():
+        write_varint(out, FORMAT_IDS[fmt])
+        write_varint(out, len(values))
+        previous = 0
+        for start, end in values:
+            write_varint(out, zigzag(start - previous))
+            write_varint(out, zigzag(end - start))
+            previous = end
+    return bytes(out)
+
+
+def decode_format_binary(data: bytes) -> Spans:
+    format: Spans = {}
+    pos = 0
+    while pos < len(data):
+        format_id, pos = read_varint(data, pos)
+        count, pos = read_varint(data, pos)
+        values = format[FORMAT_NAMES[format_id]] = []
+        previous = 0
+        for _ in range(count):
+            delta, pos = read_varint(data, pos)
+            length, pos = read_varint(data, pos)
+            start = previous + unzigzag(delta)
+            previous = start + unzigzag(length)
+            values.append((start, previous))
+    return format
+
+
+def decode_format(data: Union[str, bytes]) -> Spans:
+    "Decodes the definitions.format column, in either encoding"
+    if isinstance(data, bytes):
+        return decode_format_binary(data)
+    return decode_format_text(data)
+
+
 class StringWithFormat:
+    """Text with format spans. The text is kept as a list of chunks that are
+    only joined when `string` is read, so nesting many parts doesn't copy the
+    whole text on every add."""
+
     def __init__(self, string: Optional[str] = None):
-        self.string = string or ""
+        self._chunks: list[str] = [string] if string else []
+        self._length = len(string) if string else 0
         self.format: dict[str, list[tuple[int, int]]] = {}
 
+    @property
+    def string(self) -> str:
+        if len(self._chunks) != 1:
+            self._chunks = ["".join(self._chunks)]
+        return self._chunks[0]
+
+    @string.setter
+    def string(self, string: str) -> None:
+        self._chunks = [string]
+        self._length = len(string)
+
     @classmethod
     def join(
         cls, string_list: list["StringWithFormat"], separator: str
@@ -40,41 +167,30 @@ class StringWithFormat:
         keep_whitespace=False,
     ) -> "StringWithFormat":
         # print('ADD', repr(self), repr(self.format), repr(other), format_type)
-        if format_type and format_type.value not in self.format:
-            self.format[format_type.value] = []
-
+        n = self._length
         if isinstance(other, StringWithFormat):
             assert format_type is None
-            # first string length
-            n = len(self.string)
-            self.add(other.string, keep_whitespace=keep_whitespace)
+            if other._length:
+                # joined once here, so the chunks don't pile up through nesting
+                self._chunks.append(other.string)
+                self._length += other._length
             for fmt, fmt_list in other.format.items():
-                if fmt not in self.format:
-                    self.format[fmt] = []
-
-                if (
-                    self.format[fmt]
-                    and self.format[fmt][-1][-1] == n
-                    and fmt_list
-                    and fmt_list[0][0] == 0
-                ):
+                spans = self.format.setdefault(fmt, [])
+                if spans and spans[-1][1] == n and fmt_list and fmt_list[0][0] == 0:
                     # merge two formats in one
-                    self.format[fmt][-1] = (self.format[fmt][-1][0], n + fmt_list[0][1])
+                    spans[-1] = (spans[-1][0], n + fmt_list[0][1])
                     fmt_list = fmt_list[1:]
-                self.format[fmt] += [(start + n, end + n) for (start, end) in fmt_list]
+                spans += [(start + n, end + n) for (start, end) in fmt_list]
         else:
             if format_type:
-                last_format = self.format[format_type.value]
-                if last_format and last_format[-1][-1] == len(self.string):
-                    last_format[-1] = (
-                        last_format[-1][0],
-                        len(self.string) + len(other),
-                    )
+                spans = self.format.setdefault(format_type.value, [])
+                if spans and spans[-1][1] == n:
+                    spans[-1] = (spans[-1][0], n + len(other))
                 else:
-                    self.format[format_type.value].append(
-                        (len(self.string), len(self.string) + len(other))
-                    )
-            self.string += other
+                    spans.append((n, n + len(other)))
+            if other:
+                self._chunks.append(other)
+                self._length += len(other)
         return self
 
     def add_italic(self, other: Union[str, "StringWithFormat"]) -> "StringWithFormat":
@@ -94,16 +210,20 @@ class StringWithFormat:
         else:
             if format_type and format_type.value not in self.format:
                 self.format[format_type.value] = []
-            self.format[format_type.value].append((0, len(self.string)))
+            self.format[format_type.value].append((0, self._length))
         return self
 
     def __add__(self, other: Union[str, "StringWithFormat"]) -> "StringWithFormat":
         return self.add(other)
 
     def prepend(self, other: str) -> "StringWithFormat":
-        alt = StringWithFormat(other).add(self)
-        self.string = alt.string
-        self.format = alt.format
+        n = len(other)
+        self._chunks.insert(0, other)
+        self._length += n
+        self.format = {
+            fmt: [(start + n, end + n) for (start, end) in fmt_list]
+            for fmt, fmt_list in self.format.items()
+        }
         return self
 
     def strip(self) -> "StringWithFormat":
@@ -131,12 +251,16 @@ class StringWithFormat:
         new_string_format.format = new_format
         return new_string_format
 
+    def copy(self) -> "StringWithFormat":
+        copy = StringWithFormat(self.string)
+        copy.format = {fmt: list(fmt_list) for fmt, fmt_list in self.format.items()}
+        return copy
+
     def encode_format(self) -> str:
-        encoded = []
-        for fmt, values in self.format.items():
-            tmp_list = ["%s,%s" % item for item in values]
-            encoded.append("%s:%s" % (fmt, ";".join(tmp_list)))
-        return "\n".join(encoded)
+        return encode_format_text(self.format)
+
+    def encode_format_binary(self) -> bytes:
+        return encode_format_binary(self.format)
 
     def __eq__(self, other) -> bool:
         if isinstance(other, StringWithFormat):
@@ -147,29 +271,30 @@ class StringWithFormat:
         return "<%s %s>" % (self.__class__.__name__, repr(self.string))
 
     def __len__(self) -> int:
-        return len(self.string)
+        return self._length
 
 
 def expand_tld(string: StringWithFormat) -> StringWithFormat:
+    """Extends every tld span to the whole word around it. Each span only
+    scans the characters of its own word, which is cheaper than finding all
+    the boundaries of the text first."""
     if not isinstance(string, StringWithFormat) or not string.format.get(
         Format.TLD.value
     ):
         return string
-    boundaries = " \n:;;.,•?!()[]{}'\"„“"
-    original_format = string.format[Format.TLD.value]
+    text = string.string
+    length = len(text)
     new_format = []
-    for start, end in original_format:
-        for i in range(start, -1, -1):
-            if string.string[i] in boundaries:
-                break
-            start = i
-        for i in range(end, len(string.string)):
-            end = i
-            if string.string[i] in boundaries:
-                break
-        else:
-            end = len(string.string)
-        new_format.append((start, end))
+    for start, end in string.format[Format.TLD.value]:
+        # a span starting on a boundary stays there, otherwise it goes back to
+        # the character after the previous boundary
+        if text[start] not in BOUNDARIES:
+            while start and text[start - 1] not in BOUNDARIES:
+                start -= 1
+        # and it ends on the next boundary
+        while end < length and text[end] not in BOUNDARIES:
+            end += 1
+        new_format.append((start, min(end, length)))
 
     string.format[Format.TLD.value] = new_format
     return string
@@ -1,66 +1,205 @@
 import os
 import sqlite3
-import glob
-import itertools
 import json
-from typing import TypedDict, Optional
+import time
+import heapq
+import datetime
+import pickle
+import shutil
+import tempfile
+import contextlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import IO, Optional, Iterable, Iterator, Sequence
 
-from .utils import get_languages, get_disciplines, output_dir
+from .utils import (
+    collation_key,
+    fold_key,
+    get_languages,
+    get_disciplines,
+    output_dir,
+    revo_dir,
+)
+from .manifest import (
+    ArticleManifest,
+    Manifest,
+    article_key,
+    data_hash,
+    inputs_hash,
+    load_manifest,
+    manifest_filename,
+    manifest_hash,
+    save_manifest,
+)
+from . import article_cache
+from .binary_dict import binary_dict_path, write_binary_dict
+from .compression import compress_definitions, compression_report
+from .sources import ArticleFile, article_files, open_source
 from .parser import revo
-from .parser.string_with_format import expand_tld
-
-
-class DefinitionDict(TypedDict):
-    article_id: int
-    word: str
-    mark: str
-    definition: str
-    format: str
-    trads: dict
-    position: int
-    definition_id: Optional[int]
-
-
-class EntryDict(TypedDict):
-    article_id: int
-    word: str
-    definition: DefinitionDict
-
-
-def insert_translations(trads: list[dict], cursor: sqlite3.Cursor) -> None:
-    # flatten
-    all_trans: list[dict] = []
-    for translation in trads:
-        for snc_index, words in translation["data"].items():
-            for word in words:
-                all_trans.append(
-                    dict(translation=word, snc_index=snc_index, **translation)
-                )
+from .parser.entries import EntryDict, parse_article_text
+from .timing import Timings, timings
+from .progress import QUIET, PROGRESS, VERBOSE, progress
+from .parser.string_with_format import (
+    Format,
+    decode_format,
+    decode_format_text,
+    encode_format_binary,
+    encode_format_text,
+)
+
 
-    all_trans.sort(
-        key=lambda x: (
-            x["lng"],
-            x["translation"],
-            x["snc_index"] is None,
-            x["snc_index"],
+def create_translations_staging(cursor: sqlite3.Cursor) -> None:
+    # Translations are collected here while the words are inserted, and copied
+    # to their translations_{lang} table once we know which languages are kept
+    cursor.execute(
+        """
+        CREATE TEMP TABLE translations_staging (
+            id integer primary key,
+            lng text,
+            definition_id integer,
+            snc_index integer,
+            word text,
+            translation text,
+            key text
         )
+    """
     )
 
-    for translation in all_trans:
+
+INSERT_DEFINITION = """INSERT INTO definitions (
+    id, article_id, words, mark, position, definition, format)
+    values (?, ?, ?, ?, ?, ?, ?)"""
+INSERT_WORD = """INSERT into words (word, key, sort_key, definition_id)
+    values (?, ?, ?, ?)"""
+INSERT_STAGED_TRANSLATION = """INSERT INTO translations_staging
+    (lng, definition_id, snc_index, word, translation, key)
+    VALUES (?,?,?,?,?,?)"""
+
+
+class RowWriter:
+    "Inserts every row as soon as it is given"
+
+    def __init__(self, cursor: sqlite3.Cursor):
+        self.cursor = cursor
+
+    def insert_definition(self, values: tuple) -> int:
+        self.cursor.execute(INSERT_DEFINITION, (None,) + values)
+        assert self.cursor.lastrowid is not None
+        return self.cursor.lastrowid
+
+    def insert_word(self, word: str, definition_id: int) -> None:
+        self.cursor.execute(
+            INSERT_WORD, (word, fold_key(word), collation_key(word), definition_id)
+        )
+
+    def stage_translation(self, values: tuple) -> None:
+        self.cursor.execute(INSERT_STAGED_TRANSLATION, values)
+
+    def flush(self) -> None:
+        pass
+
+
+class BulkWriter(RowWriter):
+    """Buffers rows and inserts them with executemany. Definition ids are
+    assigned here instead of read back with lastrowid, they get the same
+    values SQLite would give them."""
+
+    def __init__(self, cursor: sqlite3.Cursor, batch_size: int = 10000):
+        super().__init__(cursor)
+        self.batch_size = batch_size
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM definitions")
+        self.next_definition_id: int = cursor.fetchone()[0] + 1
+        self.definitions: list[tuple] = []
+        self.words: list[tuple] = []
+        self.translations: list[tuple] = []
+
+    def insert_definition(self, values: tuple) -> int:
+        definition_id = self.next_definition_id
+        self.next_definition_id += 1
+        self.definitions.append((definition_id,) + values)
+        if len(self.definitions) >= self.batch_size:
+            self.flush()
+        return definition_id
+
+    def insert_word(self, word: str, definition_id: int) -> None:
+        self.words.append((word, fold_key(word), collation_key(word), definition_id))
+        if len(self.words) >= self.batch_size:
+            self.flush()
+
+    def stage_translation(self, values: tuple) -> None:
+        self.translations.append(values)
+        if len(self.translations) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self.cursor.executemany(INSERT_DEFINITION, self.definitions)
+        self.cursor.executemany(INSERT_WORD, self.words)
+        self.cursor.executemany(INSERT_STAGED_TRANSLATION, self.translations)
+        self.definitions = []
+        self.words = []
+        self.translations = []
+
+
+def configure_bulk_load(cursor: sqlite3.Cursor, new_db: bool) -> None:
+    "Build-time settings, the output DB is thrown away if the build fails"
+    if new_db:
+        # only takes effect before the first table is created
+        cursor.execute("PRAGMA page_size = 4096")
+    cursor.execute("PRAGMA journal_mode = OFF")
+    cursor.execute("PRAGMA synchronous = OFF")
+    cursor.execute("PRAGMA cache_size = -65536")
+
+
+def stage_translations(
+    writer: RowWriter, definition_id: int, trads: dict
+) -> dict[str, int]:
+    "Flatten and stage the translations, returns the number of groups per language"
+    counts: dict[str, int] = {}
+    for word, more_trads in trads.items():
+        for lng, trans_data in more_trads.items():
+            counts[lng] = counts.get(lng, 0) + 1
+            for snc_index, translations in trans_data.items():
+                for translation in translations:
+                    writer.stage_translation(
+                        (
+                            lng,
+                            definition_id,
+                            snc_index,
+                            word,
+                            translation,
+                            fold_key(translation),
+                        )
+                    )
+    return counts
+
+
+def insert_translations(cursor: sqlite3.Cursor, langs: Iterable[str]) -> None:
+    # staging id keeps the order in which equal translations were found
+    for lng in sorted(langs):
         cursor.execute(
             """INSERT INTO translations_{code}
-            (definition_id, snc_index, word, translation)
-            VALUES (?,?,?,?)""".format(code=translation["lng"]),
-            (
-                translation["row_id"],
-                translation["snc_index"],
-                translation["word"],
-                translation["translation"],
-            ),
+            (definition_id, snc_index, word, translation, key)
+            SELECT definition_id, snc_index, word, translation, key
+            FROM translations_staging
+            WHERE lng = ?
+            ORDER BY translation, snc_index IS NULL, snc_index, id""".format(code=lng),
+            (lng,),
         )
+        # created once the table is filled, incremental builds keep them
+        cursor.execute(
+            """CREATE INDEX IF NOT EXISTS index_definition_id_translations_{code}
+            ON translations_{code} (definition_id)""".format(code=lng)
+        )
+        cursor.execute(
+            """CREATE INDEX IF NOT EXISTS index_key_translations_{code}
+            ON translations_{code} (key)""".format(code=lng)
+        )
+    cursor.execute("DELETE FROM translations_staging")
 
 
-def create_db(output_db: str) -> sqlite3.Connection:
+def create_db(
+    output_db: str, bulk: bool = False, binary_format: bool = False
+) -> sqlite3.Connection:
     base_dir = os.path.dirname(__file__)
     db_filename = os.path.join(base_dir, output_db)
     try:
@@ -69,12 +208,18 @@ def create_db(output_db: str) -> sqlite3.Connection:
         pass
     conn = sqlite3.connect(db_filename)
     c = conn.cursor()
+    if bulk:
+        configure_bulk_load(c, new_db=True)
+    # key: the word without diacritics nor case, for prefix searches
+    # sort_key: the word in Esperanto alphabetical order, for browsing
     c.execute(
         """
         CREATE TABLE words (
             id integer primary key,
             word text,
-            definition_id integer
+            definition_id integer,
+            key text,
+            sort_key text
         )
     """
     )
@@ -88,14 +233,46 @@ def create_db(output_db: str) -> sqlite3.Connection:
             mark text,
             position integer,
             definition text,
-            format text
+            format {format_type}
         )
-    """
+    """.format(format_type="blob" if binary_format else "text")
     )
 
     return conn
 
 
+@contextlib.contextmanager
+def temporary_db(
+    db_filename: str, copy: bool = False, replace: bool = True
+) -> Iterator[str]:
+    """Yields a temporary file next to db_filename (a copy of it if `copy`),
+    which atomically replaces db_filename if the block finishes without errors.
+    Otherwise it's removed and db_filename is left untouched."""
+    fd, tmp_filename = tempfile.mkstemp(
+        dir=os.path.dirname(db_filename),
+        prefix=os.path.basename(db_filename) + ".",
+        suffix=".tmp",
+    )
+    os.close(fd)
+    try:
+        if copy:
+            shutil.copyfile(db_filename, tmp_filename)
+        yield tmp_filename
+        if replace:
+            os.replace(tmp_filename, db_filename)
+    finally:
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+
+def finalize_db(conn: sqlite3.Connection) -> None:
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA optimize")
+    conn.commit()
+    conn.execute("VACUUM")
+
+
 def create_langs_tables(cursor: sqlite3.Cursor, entries_per_lang: dict) -> None:
     cursor.execute(
         """
@@ -135,7 +312,8 @@ def create_langs_tables(cursor: sqlite3.Cursor, entries_per_lang: dict) -> None:
             definition_id integer,
             snc_index integer,
             word text,
-            translation text
+            translation text,
+            key text
         )
         """.format(lang=lang)
         )
@@ -179,70 +357,138 @@ def create_version_table(cursor: sqlite3.Cursor) -> None:
     cursor.execute("INSERT INTO version (id) values (?)", (version,))
 
 
-def parse_article(filename: str, num_article: int, verbose=False) -> list[EntryDict]:
-    art = None
+def write_manifest_hash(cursor: sqlite3.Cursor, manifest: Manifest) -> None:
+    """The manifest is saved after the database replaces the previous one, the
+    hash in the database tells whether that happened"""
+    cursor.execute("CREATE TABLE IF NOT EXISTS build_manifest (hash text)")
+    cursor.execute("DELETE FROM build_manifest")
+    cursor.execute(
+        "INSERT INTO build_manifest (hash) VALUES (?)", (manifest_hash(manifest),)
+    )
+
+
+def db_manifest_hash(db_filename: str) -> Optional[str]:
+    conn = sqlite3.connect(db_filename)
     try:
-        art = revo.parse_article(filename)
-    except Exception:
-        print("Error parsing %s" % filename)
-        raise
-
-    found_words = []
-    entries: list[EntryDict] = []
-    has_subart = False
-    drvs = list(art.derivations())
-    for pos, drv in enumerate(drvs, 1):
-        if isinstance(drv, revo.Subart):
-            has_subart = True
-
-        if pos == len(drvs) and has_subart and not drv.kap:
-            # first subart contains the whole article,
-            # so this snc will not be needed
-            continue
-
-        main_word_txt = drv.main_word()
-        found_words.append(main_word_txt)
-        row_id = None
-        content = drv.to_text()
-        content = expand_tld(content)
-        assert "StringWithFormat" not in content.string
-
-        # definition_id will be used to check whether the definition is already in the database
-        definition: DefinitionDict = dict(
-            article_id=num_article,
-            word=main_word_txt,
-            mark=drv.mrk,
-            definition=content.string,
-            format=content.encode_format(),
-            trads=drv.translations(),
-            position=pos,
-            definition_id=None,
-        )
-        # note that before inserting the entries will be sorted by 'word'
-        first_word = True
-        for word in main_word_txt.split(", "):
-            word = word.strip()
-            # "definition" dict is shared between entries in this loop
-            entries.append(
-                dict(article_id=num_article, word=word, definition=definition)
-            )
-            if first_word:
-                first_word = False
-                # Avoid duplication of translations
-                definition = definition.copy()
-                definition["trads"] = {}
+        row = conn.execute("SELECT hash FROM build_manifest").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+    return row[0] if row else None
 
-        if verbose:
-            print(filename, drv.mrk, row_id)
-        else:
-            print(filename, drv.mrk)
 
+def set_article_id(entries: list[EntryDict], num_article: int) -> list[EntryDict]:
+    for entry in entries:
+        entry["article_id"] = num_article
+        entry["definition"]["article_id"] = num_article
     return entries
 
 
+def parse_article(
+    file: ArticleFile,
+    num_article: int,
+    cache_dir: Optional[str] = None,
+    xml_backend: str = "etree",
+) -> tuple[list[EntryDict], str]:
+    """Returns the entries of the article and the hash of its content, for the
+    manifest and the cache key. It's computed here, where the article is read
+    anyway, so with --jobs the workers hash it instead of the main process."""
+    with timings.phase("read"):
+        data = file.read()
+    with timings.phase("hash"):
+        digest = data_hash(data)
+    article = data.decode("utf-8")
+    if not cache_dir:
+        return (
+            parse_article_text(article, file.name, num_article, xml_backend),
+            digest,
+        )
+
+    with timings.phase("cache_lookup"):
+        key = article_cache.cache_key(digest)
+        cached = article_cache.load(cache_dir, key)
+    if cached is not None:
+        # the same article can get a different number in another build
+        return set_article_id(cached, num_article), digest
+    entries = parse_article_text(article, file.name, num_article, xml_backend)
+    with timings.phase("cache_store"):
+        article_cache.store(cache_dir, key, entries)
+    return entries, digest
+
+
 def create_index(cursor: sqlite3.Cursor) -> None:
     cursor.execute("CREATE INDEX index_word_words ON words (word)")
     cursor.execute("CREATE INDEX index_definition_id_words ON words (definition_id)")
+    cursor.execute("CREATE INDEX index_key_words ON words (key, word)")
+    cursor.execute("CREATE INDEX index_sort_key_words ON words (sort_key)")
+
+
+def create_fulltext_index(cursor: sqlite3.Cursor) -> None:
+    """FTS5 indexes over the definitions and over their examples (the ekz
+    spans of the format). The words after the first one of a drv have a copy
+    of its definition, only one of them is indexed. The tokenizer folds the
+    diacritics, so ĉ and c (and cx, once the query goes through add_hats)
+    match each other."""
+    cursor.execute("DROP TABLE IF EXISTS definitions_fts")
+    cursor.execute("DROP TABLE IF EXISTS examples_fts")
+    cursor.execute("DROP TABLE IF EXISTS examples")
+    cursor.execute(
+        """
+        CREATE VIRTUAL TABLE definitions_fts USING fts5(
+            definition,
+            content='definitions',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """
+    )
+    cursor.execute(
+        """
+        INSERT INTO definitions_fts (rowid, definition)
+        SELECT MIN(id), definition FROM definitions GROUP BY article_id, position
+    """
+    )
+
+    cursor.execute(
+        """
+        CREATE TABLE examples (
+            id integer primary key,
+            definition_id integer,
+            example text
+        )
+    """
+    )
+    rows = cursor.execute(
+        """
+        SELECT MIN(id), definition, format
+        FROM definitions
+        GROUP BY article_id, position
+        ORDER BY MIN(id)
+    """
+    ).fetchall()
+    cursor.executemany(
+        "INSERT INTO examples (definition_id, example) VALUES (?, ?)",
+        (
+            (definition_id, definition[start:end])
+            for definition_id, definition, format in rows
+            for start, end in decode_format(format).get(Format.EKZ.value, [])
+        ),
+    )
+    cursor.execute(
+        "CREATE INDEX index_definition_id_examples ON examples (definition_id)"
+    )
+    cursor.execute(
+        """
+        CREATE VIRTUAL TABLE examples_fts USING fts5(
+            example,
+            content='examples',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """
+    )
+    cursor.execute("INSERT INTO examples_fts (examples_fts) VALUES ('rebuild')")
 
 
 def write_stats(entries_per_lang: dict) -> None:
@@ -251,60 +497,478 @@ def write_stats(entries_per_lang: dict) -> None:
         json.dump(entries_per_lang, f, ensure_ascii=False, indent=4)
 
 
-def insert_entries(
-    entries: list[EntryDict], cursor: sqlite3.Cursor, min_entries_to_include_lang: int
-) -> None:
-    entries = sorted(entries, key=lambda x: x["word"].lower())
-    translations = []
+def entry_sort_key(entry: EntryDict) -> str:
+    return collation_key(entry["word"])
+
+
+def write_run(entries: list[EntryDict]) -> IO[bytes]:
+    run = tempfile.TemporaryFile()
     for entry in entries:
-        print(entry["word"])
-
-        if not entry["definition"]["definition_id"]:
-            definition = entry["definition"]
-            cursor.execute(
-                """INSERT INTO definitions (
-                article_id, words, mark, position, definition, format)
-                values (?, ?, ?, ?, ?, ?)""",
+        pickle.dump(entry, run, pickle.HIGHEST_PROTOCOL)
+    run.seek(0)
+    return run
+
+
+def read_run(run: IO[bytes]) -> Iterator[EntryDict]:
+    while True:
+        try:
+            yield pickle.load(run)
+        except EOFError:
+            return
+
+
+def sort_entries(entries: Iterable[EntryDict], buffer_size: int) -> Iterator[EntryDict]:
+    """Sort stage: stable sort by word, in Esperanto alphabetical order. When
+    more than `buffer_size` entries are buffered they are spilled to disk as a
+    sorted run, and the runs are merged at the end (external merge sort). 0
+    keeps everything in memory."""
+    buffer: list[EntryDict] = []
+    runs: list[IO[bytes]] = []
+    try:
+        for entry in entries:
+            buffer.append(entry)
+            if buffer_size and len(buffer) >= buffer_size:
+                buffer.sort(key=entry_sort_key)
+                runs.append(write_run(buffer))
+                buffer = []
+        buffer.sort(key=entry_sort_key)
+        if not runs:
+            yield from buffer
+            return
+        # heapq.merge is stable: on ties, earlier runs come first
+        yield from heapq.merge(
+            *[read_run(run) for run in runs], buffer, key=entry_sort_key
+        )
+    finally:
+        for run in runs:
+            run.close()
+
+
+def insert_definitions(
+    entries: Iterable[EntryDict], writer: RowWriter, binary_format: bool = False
+) -> dict[str, int]:
+    """Insert stage: definitions and words, the translations go to the staging
+    table. Entries must come sorted. Returns the number of translation groups
+    per language."""
+    definition_ids: dict[tuple[int, int, bool], int] = {}
+    entries_per_lang: dict[str, int] = {}
+    num_entries = 0
+    timings.start("insert")
+    for entry in entries:
+        if not num_entries:
+            # the first entry comes once the previous stages are done
+            progress.start("insert")
+        num_entries += 1
+        progress.trace(entry["word"])
+        progress.update()
+
+        definition = entry["definition"]
+        key = (definition["article_id"], definition["position"], definition["is_copy"])
+        if key not in definition_ids:
+            definition_ids[key] = writer.insert_definition(
                 (
                     definition["article_id"],
                     definition["word"],
                     definition["mark"],
                     definition["position"],
                     definition["definition"],
-                    definition["format"],
-                ),
+                    (
+                        encode_format_binary(decode_format_text(definition["format"]))
+                        if binary_format
+                        else definition["format"]
+                    ),
+                )
             )
-            entry["definition"]["definition_id"] = cursor.lastrowid
+        def_id = definition_ids[key]
 
-        assert entry["definition"]["definition_id"] is not None
-        def_id: int = entry["definition"]["definition_id"]
+        writer.insert_word(entry["word"], def_id)
 
-        cursor.execute(
-            "INSERT into words (word, definition_id) values (?, ?)",
-            [entry["word"], def_id],
-        )
+        if definition["trads"]:
+            counts = stage_translations(writer, def_id, definition["trads"])
+            for lng, count in counts.items():
+                entries_per_lang[lng] = entries_per_lang.get(lng, 0) + count
+    writer.flush()
+    timings.stop(num_entries)
+    if num_entries:
+        progress.finish()
+    return entries_per_lang
+
+
+def count_translations(entries: list[EntryDict]) -> dict[str, int]:
+    "Number of translation groups per language, as counted by insert_entries"
+    counts: dict[str, int] = {}
+    for entry in entries:
+        for more_trads in entry["definition"]["trads"].values():
+            for lng in more_trads:
+                counts[lng] = counts.get(lng, 0) + 1
+    return counts
 
-        trads = entry["definition"]["trads"]
-        if trads:
-            for word, more_trads in trads.items():
-                for lng, trans_data in more_trads.items():
-                    translations.append(
-                        dict(row_id=def_id, word=word, lng=lng, data=trans_data)
-                    )
 
-    translations = sorted(translations, key=lambda x: x["lng"])
+def insert_entries(
+    entries: Iterable[EntryDict],
+    cursor: sqlite3.Cursor,
+    min_entries_to_include_lang: int,
+    bulk: bool = False,
+    binary_format: bool = False,
+) -> None:
+    create_translations_staging(cursor)
+    writer = BulkWriter(cursor) if bulk else RowWriter(cursor)
+    all_entries_per_lang = insert_definitions(entries, writer, binary_format)
+
     entries_per_lang = {}
-    for lng, g in itertools.groupby(translations, key=lambda x: x["lng"]):
-        count = len(list(g))
+    for lng, count in sorted(all_entries_per_lang.items()):
         if count >= min_entries_to_include_lang:
-            print(lng, count)
+            progress.message("%s %d" % (lng, count))
             entries_per_lang[lng] = count
 
     write_stats(entries_per_lang)
 
     create_langs_tables(cursor, entries_per_lang)
-    translations = [t for t in translations if t["lng"] in entries_per_lang]
-    insert_translations(translations, cursor)
+    with timings.phase("insert_translations", len(entries_per_lang)):
+        insert_translations(cursor, entries_per_lang)
+
+
+def list_files(
+    xml_file: Optional[str], source: Optional[str] = None
+) -> list[ArticleFile]:
+    "The articles of xml_file, of the source directory or archive, or of revo/xml"
+    path = xml_file or source or os.path.join(revo_dir(), "xml")
+    return article_files(open_source(path))
+
+
+def select_files(
+    files: list[ArticleFile], word: Optional[str], limit: Optional[int]
+) -> list[ArticleFile]:
+    selected = [file for file in files if not word or word in file.name]
+    if limit:
+        # the limit counts from article number 1, so limit=N keeps N - 1 articles
+        selected = selected[: max(limit - 1, 1)]
+    return selected
+
+
+def parse_articles(
+    files: list[ArticleFile],
+    jobs: int,
+    numbers: Optional[Sequence[int]] = None,
+    cache_dir: Optional[str] = None,
+    xml_backend: str = "etree",
+) -> Iterator[tuple[list[EntryDict], str]]:
+    """Parse the articles in order, fanning out to `jobs` worker processes.
+    Yields the entries and the hash of every article."""
+    if numbers is None:
+        numbers = range(1, len(files) + 1)
+    if jobs <= 1 or len(files) <= 1:
+        for file, num_article in zip(files, numbers):
+            yield parse_article(file, num_article, cache_dir, xml_backend)
+        return
+
+    # map() yields results in submission order, so article numbering and
+    # the final DB don't depend on the number of workers
+    chunksize = max(1, len(files) // (jobs * 16))
+    # loaded before forking, so that the workers inherit the entity table
+    revo.escaped_entities()
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for parsed, worker_timings in executor.map(
+            parse_article_worker,
+            files,
+            numbers,
+            itertools.repeat(cache_dir),
+            itertools.repeat(xml_backend),
+            chunksize=chunksize,
+        ):
+            timings.merge(worker_timings)
+            yield parsed
+
+
+def parse_article_worker(
+    file: ArticleFile, num_article: int, cache_dir: Optional[str], xml_backend: str
+) -> tuple[tuple[list[EntryDict], str], Timings]:
+    "Runs in a worker process, also returns the timings of the article"
+    timings.reset()
+    return parse_article(file, num_article, cache_dir, xml_backend), timings
+
+
+def read_entries(
+    files: list[ArticleFile],
+    jobs: int,
+    articles: dict[str, ArticleManifest],
+    numbers: Optional[Sequence[int]] = None,
+    cache_dir: Optional[str] = None,
+    xml_backend: str = "etree",
+) -> Iterator[EntryDict]:
+    "Parse stage: yields the entries of every article and records it in `articles`"
+    if numbers is None:
+        numbers = range(1, len(files) + 1)
+    progress.start("parse", len(files))
+    for file, num_article, (parsed_entries, digest) in zip(
+        files, numbers, parse_articles(files, jobs, numbers, cache_dir, xml_backend)
+    ):
+        for entry in parsed_entries:
+            if not entry["definition"]["is_copy"]:
+                progress.trace("%s %s" % (file.name, entry["definition"]["mark"]))
+        progress.update()
+        articles[article_key(file.name)] = ArticleManifest(
+            hash=digest,
+            article_id=num_article,
+            langs=count_translations(parsed_entries),
+        )
+        yield from parsed_entries
+    progress.finish()
+
+
+def build_options(
+    min_entries_to_include_lang: int, binary_format: bool, fts: bool, compress: bool
+) -> dict:
+    "Options that change the database, a change of any of them needs a full build"
+    return dict(
+        min_entries_to_include_lang=min_entries_to_include_lang,
+        binary_format=binary_format,
+        fts=fts,
+        compress=compress,
+    )
+
+
+def update_db(
+    db_filename: str,
+    files: list[ArticleFile],
+    jobs: int,
+    min_entries_to_include_lang: int,
+    bulk: bool = False,
+    cache_dir: Optional[str] = None,
+    xml_backend: str = "etree",
+    binary_format: bool = False,
+    fts: bool = False,
+    compress: bool = False,
+) -> bool:
+    """Patch an existing database with the articles that changed since the
+    last build. Returns False when a full build is needed instead."""
+    manifest = load_manifest(manifest_filename(db_filename))
+    inputs = inputs_hash(
+        build_options(min_entries_to_include_lang, binary_format, fts, compress)
+    )
+    if (
+        manifest is None
+        or manifest["inputs"] != inputs
+        or not os.path.exists(db_filename)
+    ):
+        progress.message("No usable manifest, doing a full build")
+        return False
+    if db_manifest_hash(db_filename) != manifest_hash(manifest):
+        # the build that replaced the database didn't save its manifest
+        progress.message("The manifest doesn't match the database, doing a full build")
+        return False
+
+    old_articles = manifest["articles"]
+    hashes = {article_key(file.name): data_hash(file.read()) for file in files}
+    changed = [
+        file
+        for file in files
+        if article_key(file.name) in old_articles
+        and old_articles[article_key(file.name)]["hash"]
+        != hashes[article_key(file.name)]
+    ]
+    added = [file for file in files if article_key(file.name) not in old_articles]
+    removed = [key for key in old_articles if key not in hashes]
+    progress.message(
+        "Articles changed: %d, added: %d, removed: %d"
+        % (len(changed), len(added), len(removed))
+    )
+    if not changed and not added and not removed:
+        return True
+
+    # Article ids are stable: changed articles keep theirs, new ones get fresh ids
+    articles = {key: old_articles[key] for key in hashes if key in old_articles}
+    numbers = [old_articles[article_key(file.name)]["article_id"] for file in changed]
+    numbers += range(
+        manifest["next_article_id"], manifest["next_article_id"] + len(added)
+    )
+
+    # only the changed articles are kept in memory
+    entries = list(
+        timings.iterate(
+            "parse",
+            read_entries(
+                changed + added, jobs, articles, numbers, cache_dir, xml_backend
+            ),
+        )
+    )
+
+    entries_per_lang: dict[str, int] = {}
+    for article in articles.values():
+        for lng, count in article["langs"].items():
+            entries_per_lang[lng] = entries_per_lang.get(lng, 0) + count
+    entries_per_lang = {
+        lng: count
+        for lng, count in entries_per_lang.items()
+        if count >= min_entries_to_include_lang
+    }
+
+    conn = sqlite3.connect(db_filename)
+    try:
+        langs = [row[0] for row in conn.execute("SELECT code FROM languages")]
+    finally:
+        conn.close()
+    if set(langs) != set(entries_per_lang):
+        progress.message("The set of included languages changed, doing a full build")
+        return False
+
+    new_manifest = Manifest(
+        inputs=inputs,
+        next_article_id=manifest["next_article_id"] + len(added),
+        articles=articles,
+    )
+    with temporary_db(db_filename, copy=True) as tmp_filename:
+        conn = sqlite3.connect(tmp_filename)
+        cursor = conn.cursor()
+        if bulk:
+            configure_bulk_load(cursor, new_db=False)
+        try:
+            stale_ids = [
+                old_articles[article_key(file.name)]["article_id"] for file in changed
+            ]
+            stale_ids += [old_articles[key]["article_id"] for key in removed]
+            for article_id in stale_ids:
+                definition_ids = "SELECT id FROM definitions WHERE article_id = ?"
+                cursor.execute(
+                    "DELETE FROM words WHERE definition_id IN (%s)" % definition_ids,
+                    (article_id,),
+                )
+                for lang in langs:
+                    cursor.execute(
+                        "DELETE FROM translations_%s WHERE definition_id IN (%s)"
+                        % (lang, definition_ids),
+                        (article_id,),
+                    )
+                cursor.execute(
+                    "DELETE FROM definitions WHERE article_id = ?", (article_id,)
+                )
+
+            create_translations_staging(cursor)
+            writer = BulkWriter(cursor) if bulk else RowWriter(cursor)
+            insert_definitions(
+                timings.iterate("sort", sort_entries(entries, 0)), writer, binary_format
+            )
+            with timings.phase("insert_translations", len(entries_per_lang)):
+                insert_translations(cursor, entries_per_lang)
+            for lng, count in entries_per_lang.items():
+                cursor.execute(
+                    "UPDATE languages SET num_entries = ? WHERE code = ?",
+                    (count, lng),
+                )
+            write_stats(dict(sorted(entries_per_lang.items())))
+            if fts:
+                with timings.phase("fulltext_index"):
+                    create_fulltext_index(cursor)
+            if compress:
+                with timings.phase("compress"):
+                    compress_definitions(cursor)
+            write_manifest_hash(cursor, new_manifest)
+            with timings.phase("finalize"):
+                finalize_db(conn)
+        finally:
+            cursor.close()
+            conn.close()
+
+    save_manifest(manifest_filename(db_filename), new_manifest)
+    return True
+
+
+def format_sizes(db_filename: str) -> dict[str, int]:
+    "Size of the definitions.format column in the text and binary encodings"
+    sizes = dict(text=0, binary=0)
+    conn = sqlite3.connect(db_filename)
+    try:
+        for (data,) in conn.execute("SELECT format FROM definitions"):
+            format = decode_format(data)
+            sizes["text"] += len(encode_format_text(format).encode())
+            sizes["binary"] += len(encode_format_binary(format))
+    finally:
+        conn.close()
+    return sizes
+
+
+def article_cache_dir() -> str:
+    return os.path.join(output_dir(), "cache", "articles")
+
+
+def write_report(report: dict) -> None:
+    base_dir = os.path.dirname(__file__)
+    with open(os.path.join(base_dir, "..", "build_report.json"), "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+
+
+def build_db(
+    db_filename: str,
+    files: list[ArticleFile],
+    jobs: int,
+    dry_run: bool,
+    min_entries_to_include_lang: int,
+    sort_buffer_size: int,
+    bulk: bool,
+    cache_dir: Optional[str] = None,
+    xml_backend: str = "etree",
+    binary_format: bool = False,
+    fts: bool = False,
+    compress: bool = False,
+) -> None:
+    articles: dict[str, ArticleManifest] = {}
+    # the database is built aside and only replaces the previous one on success
+    with temporary_db(db_filename, replace=not dry_run) as tmp_filename:
+        conn = create_db(tmp_filename, bulk, binary_format)
+        cursor = conn.cursor()
+        try:
+            if not dry_run:
+                create_disciplines_tables(cursor)
+
+            # parse -> sort -> insert, each stage pulls entries from the previous one
+            entries = timings.iterate(
+                "parse",
+                read_entries(
+                    files, jobs, articles, cache_dir=cache_dir, xml_backend=xml_backend
+                ),
+            )
+            if dry_run:
+                for _ in entries:
+                    pass
+            else:
+                sorted_entries = timings.iterate(
+                    "sort", sort_entries(entries, sort_buffer_size)
+                )
+                insert_entries(
+                    sorted_entries,
+                    cursor,
+                    min_entries_to_include_lang,
+                    bulk,
+                    binary_format,
+                )
+                with timings.phase("index"):
+                    create_index(cursor)
+                if fts:
+                    with timings.phase("fulltext_index"):
+                        create_fulltext_index(cursor)
+                if compress:
+                    with timings.phase("compress"):
+                        compress_definitions(cursor)
+                create_version_table(cursor)
+                # the articles are all parsed by now
+                manifest = Manifest(
+                    inputs=inputs_hash(
+                        build_options(
+                            min_entries_to_include_lang, binary_format, fts, compress
+                        )
+                    ),
+                    next_article_id=len(files) + 1,
+                    articles=articles,
+                )
+                write_manifest_hash(cursor, manifest)
+                with timings.phase("finalize"):
+                    finalize_db(conn)
+        finally:
+            cursor.close()
+            conn.close()
+
+    if not dry_run:
+        save_manifest(manifest_filename(db_filename), manifest)
 
 
 def main(
@@ -315,41 +979,127 @@ def main(
     verbose: bool,
     dry_run: bool,
     min_entries_to_include_lang: int,
+    jobs: int = 1,
+    incremental: bool = False,
+    sort_buffer_size: int = 100000,
+    bulk: bool = False,
+    quiet: bool = False,
+    cache: bool = False,
+    cache_size_mb: int = 1024,
+    xml_backend: str = "etree",
+    source: Optional[str] = None,
+    binary_format: bool = False,
+    fts: bool = False,
+    compress: bool = False,
+    binary_dict: bool = False,
 ) -> None:
-    conn = create_db(os.path.join(output_dir(), output_db))
-    cursor = conn.cursor()
+    if fts and compress:
+        # the full-text index reads the definitions as text
+        raise Exception("--compress can't be combined with --fts")
+    progress.level = QUIET if quiet else VERBOSE if verbose else PROGRESS
+    timings.reset()
+    started = datetime.datetime.now()
+    wall = time.perf_counter()
+    cpu = time.process_time()
 
-    if not dry_run:
-        create_disciplines_tables(cursor)
+    # time not spent in any specific phase goes to "other"
+    with timings.phase("other", 0):
+        db_filename = os.path.join(output_dir(), output_db)
+        files = select_files(list_files(xml_file, source), word, limit)
+        cache_dir = article_cache_dir() if cache else None
+        updated = (
+            incremental
+            and not dry_run
+            and update_db(
+                db_filename,
+                files,
+                jobs,
+                min_entries_to_include_lang,
+                bulk,
+                cache_dir,
+                xml_backend,
+                binary_format,
+                fts,
+                compress,
+            )
+        )
+        if not updated:
+            build_db(
+                db_filename,
+                files,
+                jobs,
+                dry_run,
+                min_entries_to_include_lang,
+                sort_buffer_size,
+                bulk,
+                cache_dir,
+                xml_backend,
+                binary_format,
+                fts,
+                compress,
+            )
+        format_bytes = None
+        if binary_format and not dry_run:
+            with timings.phase("format_sizes"):
+                format_bytes = format_sizes(db_filename)
+            progress.message(
+                "Format column: %d bytes, %d as text (%.1f%% smaller)"
+                % (
+                    format_bytes["binary"],
+                    format_bytes["text"],
+                    100 - 100 * format_bytes["binary"] / (format_bytes["text"] or 1),
+                )
+            )
+        binary_dict_bytes = None
+        if binary_dict and not dry_run:
+            with timings.phase("binary_dict"):
+                binary_dict_bytes = write_binary_dict(
+                    db_filename, binary_dict_path(db_filename)
+                )
+            progress.message("Binary dictionary: %d bytes" % binary_dict_bytes)
+        compression = None
+        if compress and not dry_run:
+            with timings.phase("compression_report"):
+                compression = compression_report(db_filename)
+            progress.message(
+                "Compressed definitions: %d bytes, %d without compression,"
+                " %.1f us to read a definition, %.1f us without compression"
+                % (
+                    compression["compressed_bytes"],
+                    compression["plain_bytes"],
+                    compression["compressed_us_per_row"],
+                    compression["plain_us_per_row"],
+                )
+            )
+        if cache_dir:
+            with timings.phase("cache_evict"):
+                removed = article_cache.evict(cache_dir, cache_size_mb * 2**20)
+            if removed:
+                progress.message("Removed %d old entries from the cache" % removed)
 
-    entries: list[EntryDict] = []
-    try:
-        files = []
-        if xml_file:
-            files = [xml_file]
-        else:
-            base_dir = os.path.dirname(__file__)
-            path = os.path.join(base_dir, "..", "revo", "xml", "*.xml")
-            files = glob.glob(path)
-        files.sort()
-
-        num_article = 1
-        for filename in files:
-            if word and word not in filename:
-                continue
-            parsed_entries = parse_article(filename, num_article, verbose)
-            entries += parsed_entries
-            num_article += 1
-
-            if limit and num_article >= limit:
-                break
-
-        if not dry_run:
-            insert_entries(entries, cursor, min_entries_to_include_lang)
-            create_index(cursor)
-            create_version_table(cursor)
-    finally:
-        if not dry_run:
-            conn.commit()
-        cursor.close()
-        conn.close()
+    write_report(
+        dict(
+            started=started.isoformat(timespec="seconds"),
+            output_db=output_db,
+            articles=len(files),
+            jobs=jobs,
+            incremental=bool(updated),
+            bulk=bulk,
+            cache=cache,
+            xml_backend=xml_backend,
+            source=source,
+            binary_format=binary_format,
+            fts=fts,
+            compress=compress,
+            compression=compression,
+            format_bytes=format_bytes,
+            binary_dict=binary_dict,
+            binary_dict_bytes=binary_dict_bytes,
+            dry_run=dry_run,
+            wall_s=round(time.perf_counter() - wall, 6),
+            # CPU time of the main process, the phases run by the workers
+            # are summed over all of them
+            cpu_s=round(time.process_time() - cpu, 6),
+            phases=timings.report(),
+        )
+    )
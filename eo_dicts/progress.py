@@ -0,0 +1,95 @@
+import sys
+import time
+from typing import Optional, TextIO
+
+QUIET = 0
+# default, rate-limited summary of every stage
+PROGRESS = 1
+# also prints every article and word processed
+VERBOSE = 2
+
+
+class Progress:
+    """Progress output of a build. Lines of the per-item trace are buffered
+    and only written in VERBOSE level, the progress lines are rate-limited."""
+
+    def __init__(
+        self,
+        level: int = PROGRESS,
+        interval: float = 2.0,
+        stream: Optional[TextIO] = None,
+        trace_buffer_size: int = 1000,
+    ):
+        self.level = level
+        self.interval = interval
+        self.stream = stream
+        self.trace_buffer_size = trace_buffer_size
+        self.trace_lines: list[str] = []
+        self.name = ""
+        self.total: Optional[int] = None
+        self.count = 0
+        self.started = 0.0
+        self.last_shown = 0.0
+
+    def out(self) -> TextIO:
+        # resolved on every write so it follows sys.stdout being replaced
+        return self.stream or sys.stdout
+
+    def message(self, text: str) -> None:
+        if self.level >= PROGRESS:
+            self.flush()
+            print(text, file=self.out())
+
+    def trace(self, line: str) -> None:
+        if self.level < VERBOSE:
+            return
+        self.trace_lines.append(line)
+        if len(self.trace_lines) >= self.trace_buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.trace_lines:
+            self.out().write("\n".join(self.trace_lines) + "\n")
+            self.trace_lines = []
+
+    def start(self, name: str, total: Optional[int] = None) -> None:
+        self.name = name
+        self.total = total
+        self.count = 0
+        self.started = self.last_shown = time.monotonic()
+
+    def update(self, count: int = 1) -> None:
+        self.count += count
+        if self.level != PROGRESS:
+            return
+        now = time.monotonic()
+        if now - self.last_shown >= self.interval:
+            self.last_shown = now
+            self.message(self.summary(now))
+
+    def finish(self) -> None:
+        self.message(self.summary(time.monotonic(), finished=True))
+        self.flush()
+
+    def summary(self, now: float, finished: bool = False) -> str:
+        elapsed = now - self.started
+        rate = self.count / elapsed if elapsed else 0.0
+        if self.total:
+            text = "%s: %d/%d (%.1f%%)" % (
+                self.name,
+                self.count,
+                self.total,
+                100 * self.count / self.total,
+            )
+        else:
+            text = "%s: %d" % (self.name, self.count)
+        text += ", %.0f/s" % rate
+        if finished:
+            text += ", done in %.1fs" % elapsed
+        elif self.total and rate:
+            text += ", ETA %.0fs" % ((self.total - self.count) / rate)
+        return text
+
+
+# Progress of the running build
+progress = Progress()
@@ -1,12 +1,45 @@
 import sqlite3
 import os
 import humanize
-from .utils import output_dir
+from typing import Optional
+from .binary_dict import binary_search
+from .compression import decompress, load_dictionary
+from .utils import add_hats, collation_key, fold_key, output_dir, prefix_range
 
 
-def search_multiple(*words: str) -> None:
+def search_multiple(
+    *words: str,
+    fts: bool = False,
+    prefix: bool = False,
+    limit: int = 20,
+    lang: Optional[str] = None,
+    binary: bool = False,
+) -> None:
+    if fts:
+        fulltext_search(" ".join(words))
+        return
     for word in words:
-        search(word)
+        if lang:
+            translation_search(lang, word, prefix, limit)
+        elif prefix:
+            prefix_search(word, limit)
+        elif binary:
+            binary_search(word)
+        else:
+            search(word)
+
+
+def search_word(cursor: sqlite3.Cursor, word: str) -> list[sqlite3.Row]:
+    return cursor.execute(
+        """
+            SELECT *
+            FROM words w
+            LEFT JOIN definitions d ON (w.definition_id = d.id)
+            WHERE word = ?
+            ORDER BY w.id
+            """,
+        (word,),
+    ).fetchall()
 
 
 def search(word: str) -> None:
@@ -15,16 +48,11 @@ def search(word: str) -> None:
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
     try:
-        for row in cursor.execute(
-            """
-                SELECT *
-                FROM words w
-                LEFT JOIN definitions d ON (w.definition_id = d.id)
-                WHERE word = ?
-                """,
-            (word,),
-        ):
+        dictionary = load_dictionary(cursor)
+        for row in search_word(cursor, word):
             for field, value in dict(row).items():
+                if field == "definition":
+                    value = decompress(value, dictionary)
                 print("%s: %s" % (field, repr(value)))
             print("")
     finally:
@@ -32,6 +60,222 @@ def search(word: str) -> None:
         conn.close()
 
 
+def prefix_query(prefix: str, limit: int = 20) -> tuple[str, tuple]:
+    """Query of the words starting with prefix, ignoring case and diacritics,
+    ĉ can also be written as cx. The range over words.key is resolved with
+    its index."""
+    lower, upper = prefix_range(fold_key(add_hats(prefix)))
+    query = """
+        SELECT w.word, d.id, d.mark
+        FROM words w
+        JOIN definitions d ON (w.definition_id = d.id)
+        WHERE w.key >= ?
+    """
+    params: tuple = (lower,)
+    if upper is not None:
+        query += " AND w.key < ?"
+        params += (upper,)
+    query += " ORDER BY w.key, w.word LIMIT ?"
+    return query, params + (limit,)
+
+
+def search_prefix(
+    cursor: sqlite3.Cursor, prefix: str, limit: int = 20
+) -> list[sqlite3.Row]:
+    return cursor.execute(*prefix_query(prefix, limit)).fetchall()
+
+
+def prefix_search(prefix: str, limit: int = 20) -> None:
+    db_filename = os.path.join(output_dir(), "vortaro.db")
+    conn = sqlite3.connect(db_filename)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    try:
+        for row in search_prefix(cursor, prefix, limit):
+            print("%s (%s)" % (row["word"], row["mark"]))
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def browse_query(
+    after_key: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = 20,
+) -> tuple[str, tuple]:
+    """Query of a page of words in alphabetical order (keyset pagination): the
+    first `limit` words after the one with sort_key after_key and id after_id,
+    the last row of the previous page. Without after_id, the words after every
+    word with that sort_key. Each page is a range over the sort_key index, so
+    it costs the same wherever it starts."""
+    query = """
+        SELECT w.id, w.word, w.sort_key, d.id AS definition_id, d.mark
+        FROM words w
+        JOIN definitions d ON (w.definition_id = d.id)
+    """
+    params: tuple = ()
+    if after_key is not None and after_id is not None:
+        query += " WHERE (w.sort_key, w.id) > (?, ?)"
+        params = (after_key, after_id)
+    elif after_key is not None:
+        query += " WHERE w.sort_key > ?"
+        params = (after_key,)
+    query += " ORDER BY w.sort_key, w.id LIMIT ?"
+    return query, params + (limit,)
+
+
+def browse_words(
+    cursor: sqlite3.Cursor,
+    after_key: Optional[str] = None,
+    after_id: Optional[int] = None,
+    limit: int = 20,
+) -> list[sqlite3.Row]:
+    return cursor.execute(*browse_query(after_key, after_id, limit)).fetchall()
+
+
+def browse(after: Optional[str] = None, limit: int = 20) -> None:
+    "Prints the words following the word after in alphabetical order"
+    db_filename = os.path.join(output_dir(), "vortaro.db")
+    conn = sqlite3.connect(db_filename)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    try:
+        after_key = None if after is None else collation_key(add_hats(after))
+        for row in browse_words(cursor, after_key, None, limit):
+            print("%s (%s)" % (row["word"], row["mark"]))
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def translation_query(
+    lang: str, word: str, prefix: bool = False, limit: int = 20
+) -> tuple[str, tuple]:
+    """Query of the translations to lang equal to word (or starting with it),
+    ignoring case and diacritics, with the Esperanto words they translate"""
+    if not lang.isalnum():
+        raise Exception("Invalid language code: %s" % lang)
+    query = """
+        SELECT t.translation, t.word, t.snc_index, d.id, d.mark
+        FROM translations_{lang} t
+        JOIN definitions d ON (t.definition_id = d.id)
+    """.format(lang=lang)
+    key = fold_key(word)
+    params: tuple
+    if not prefix:
+        query += " WHERE t.key = ?"
+        params = (key,)
+    else:
+        lower, upper = prefix_range(key)
+        query += " WHERE t.key >= ?"
+        params = (lower,)
+        if upper is not None:
+            query += " AND t.key < ?"
+            params += (upper,)
+    query += " ORDER BY t.key, t.id LIMIT ?"
+    return query, params + (limit,)
+
+
+def search_translations(
+    cursor: sqlite3.Cursor,
+    lang: str,
+    word: str,
+    prefix: bool = False,
+    limit: int = 20,
+) -> list[sqlite3.Row]:
+    "Reverse lookup: the Esperanto words with a translation to lang like word"
+    cursor.execute("SELECT 1 FROM languages WHERE code = ?", (lang,))
+    if cursor.fetchone() is None:
+        raise Exception("Language %s is not in the database" % lang)
+    return cursor.execute(*translation_query(lang, word, prefix, limit)).fetchall()
+
+
+def translation_search(lang: str, word: str, prefix: bool, limit: int) -> None:
+    db_filename = os.path.join(output_dir(), "vortaro.db")
+    conn = sqlite3.connect(db_filename)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    try:
+        for row in search_translations(cursor, lang, word, prefix, limit):
+            print("%s: %s (%s)" % (row["translation"], row["word"], row["mark"]))
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def fulltext_query(text: str) -> str:
+    """FTS5 query matching all the words of the text, ĉ can be written as cx.
+    A word ending in * matches the words starting with it."""
+    terms = []
+    for word in add_hats(text).split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"%s"%s' % (word.replace('"', '""'), "*" if prefix else ""))
+    return " ".join(terms)
+
+
+def search_definitions(
+    cursor: sqlite3.Cursor, text: str, limit: int = 20
+) -> list[sqlite3.Row]:
+    "Definitions matching the words of the text, best ranked first"
+    return cursor.execute(
+        """
+        SELECT d.id, d.words, d.mark,
+            snippet(definitions_fts, 0, '[', ']', '…', 12) AS snippet
+        FROM definitions_fts
+        JOIN definitions d ON (d.id = definitions_fts.rowid)
+        WHERE definitions_fts MATCH ?
+        ORDER BY rank
+        LIMIT ?
+        """,
+        (fulltext_query(text), limit),
+    ).fetchall()
+
+
+def search_examples(
+    cursor: sqlite3.Cursor, text: str, limit: int = 20
+) -> list[sqlite3.Row]:
+    "Example sentences matching the words of the text, best ranked first"
+    return cursor.execute(
+        """
+        SELECT d.id, d.words, d.mark,
+            highlight(examples_fts, 0, '[', ']') AS example
+        FROM examples_fts
+        JOIN examples e ON (e.id = examples_fts.rowid)
+        JOIN definitions d ON (d.id = e.definition_id)
+        WHERE examples_fts MATCH ?
+        ORDER BY rank
+        LIMIT ?
+        """,
+        (fulltext_query(text), limit),
+    ).fetchall()
+
+
+def fulltext_search(text: str) -> None:
+    db_filename = os.path.join(output_dir(), "vortaro.db")
+    conn = sqlite3.connect(db_filename)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    try:
+        try:
+            definitions = search_definitions(cursor, text)
+        except sqlite3.OperationalError:
+            raise Exception(
+                "%s has no full-text index, build it with process_revo --fts"
+                % db_filename
+            )
+        print("Definitions:")
+        for row in definitions:
+            print("%s (%s): %s" % (row["words"], row["mark"], row["snippet"]))
+        print("\nExamples:")
+        for row in search_examples(cursor, text):
+            print("%s (%s): %s" % (row["words"], row["mark"], row["example"]))
+    finally:
+        cursor.close()
+        conn.close()
+
+
 def stats() -> None:
     db_filename = os.path.join(output_dir(), "vortaro.db")
     conn = sqlite3.connect(db_filename)
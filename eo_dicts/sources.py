@@ -0,0 +1,135 @@
+"""Where the articles are read from: the revo/xml directory or an archive
+(zip or tar) of articles, like the revoxml.zip release, read without
+extracting it.
+
+The sources only keep the path of the archive, so they are cheap to pickle
+to the worker processes, each process opens the archive on its own. A
+compressed tar is decompressed once, by the process listing its articles,
+and the workers forked after it inherit its articles."""
+
+import os
+import glob
+import zipfile
+import tarfile
+import functools
+import posixpath
+from typing import NamedTuple, Union
+
+
+def select_members(names: list[str]) -> list[str]:
+    """The articles of an archive: its *.xml files, only the ones in a revo/
+    directory if it has one, like the Revo release does"""
+    xml_names = [name for name in names if name.endswith(".xml")]
+    in_revo_dir = [
+        name
+        for name in xml_names
+        if posixpath.basename(posixpath.dirname(name)) == "revo"
+    ]
+    return sorted(in_revo_dir or xml_names)
+
+
+@functools.cache
+def open_zip(path: str, pid: int) -> zipfile.ZipFile:
+    # one handle per process, forked workers must not share the file offset
+    return zipfile.ZipFile(path)
+
+
+@functools.cache
+def tar_members(path: str) -> dict[str, Union[tuple[int, int], bytes]]:
+    """Offset and size of every member of an uncompressed tar, so they can be
+    read at random. Compressed tars can only be read in order, so their
+    articles are read into memory in a single pass. No handle is kept, so
+    forked workers can share the result."""
+    try:
+        with tarfile.open(path, "r:") as tar:
+            return {
+                member.name: (member.offset_data, member.size)
+                for member in tar
+                if member.isfile()
+            }
+    except tarfile.ReadError:
+        pass
+    members: dict[str, Union[tuple[int, int], bytes]] = {}
+    with tarfile.open(path, "r:*") as tar:
+        for member in tar:
+            if member.isfile() and member.name.endswith(".xml"):
+                f = tar.extractfile(member)
+                assert f is not None
+                members[member.name] = f.read()
+    return members
+
+
+class DirectorySource:
+    "*.xml files of a directory, or a single file"
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def names(self) -> list[str]:
+        if os.path.isfile(self.path):
+            return [self.path]
+        return sorted(glob.glob(os.path.join(self.path, "*.xml")))
+
+    def read(self, name: str) -> bytes:
+        with open(name, "rb") as f:
+            return f.read()
+
+
+class ZipSource:
+    def __init__(self, path: str):
+        self.path = path
+
+    def names(self) -> list[str]:
+        return select_members(open_zip(self.path, os.getpid()).namelist())
+
+    def read(self, name: str) -> bytes:
+        return open_zip(self.path, os.getpid()).read(name)
+
+
+class TarSource:
+    def __init__(self, path: str):
+        self.path = path
+
+    def names(self) -> list[str]:
+        return select_members(list(tar_members(self.path)))
+
+    def read(self, name: str) -> bytes:
+        member = tar_members(self.path)[name]
+        if isinstance(member, bytes):
+            return member
+        offset, size = member
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return f.read(size)
+
+
+Source = Union[DirectorySource, ZipSource, TarSource]
+
+
+def open_source(path: str) -> Source:
+    if os.path.isdir(path):
+        return DirectorySource(path)
+    if not os.path.isfile(path):
+        raise Exception("Can't read articles from %s" % path)
+    if zipfile.is_zipfile(path):
+        return ZipSource(path)
+    if tarfile.is_tarfile(path):
+        return TarSource(path)
+    return DirectorySource(path)
+
+
+class ArticleFile(NamedTuple):
+    "An article of a source, `name` is its path or the name of the member"
+
+    source: Source
+    name: str
+
+    def read(self) -> bytes:
+        return self.source.read(self.name)
+
+    def text(self) -> str:
+        return self.read().decode("utf-8")
+
+
+def article_files(source: Source) -> list[ArticleFile]:
+    return [ArticleFile(source, name) for name in source.names()]
@@ -0,0 +1,96 @@
+import os
+import pytest
+from .. import article_cache
+from ..manifest import data_hash, database_files, parser_files
+
+
+def test_store_and_load(tmp_path):
+    cache_dir = str(tmp_path)
+    assert article_cache.load(cache_dir, "ab12") is None
+    article_cache.store(cache_dir, "ab12", [{"word": "abelo"}])
+    assert article_cache.load(cache_dir, "ab12") == [{"word": "abelo"}]
+    assert os.listdir(tmp_path / "ab") == ["ab12.pickle"]
+
+
+def test_corrupted_entry(tmp_path):
+    cache_dir = str(tmp_path)
+    article_cache.store(cache_dir, "cd34", "bovo")
+    with open(article_cache.cache_path(cache_dir, "cd34"), "r+b") as f:
+        f.truncate(5)
+    assert article_cache.load(cache_dir, "cd34") is None
+
+
+@pytest.mark.skipif(
+    hasattr(os, "geteuid") and os.geteuid() == 0, reason="root ignores the mode"
+)
+def test_read_only_cache_dir(tmp_path, capsys):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    article_cache.store(str(cache_dir), "ab12", "abelo")
+    cache_dir.chmod(0o500)
+    (cache_dir / "ab").chmod(0o500)
+    try:
+        article_cache.store(str(cache_dir), "ab34", "bovo")
+        article_cache.store(str(cache_dir), "cd56", "ĉevalo")
+        assert article_cache.load(str(cache_dir), "ab12") == "abelo"
+        assert article_cache.load(str(cache_dir), "ab34") is None
+        assert article_cache.load(str(cache_dir), "cd56") is None
+        assert article_cache.evict(str(cache_dir), 0) == 0
+    finally:
+        (cache_dir / "ab").chmod(0o700)
+        cache_dir.chmod(0o700)
+    assert capsys.readouterr().out.count("Warning") == 1
+
+
+def test_unwritable_cache_dir(tmp_path, monkeypatch, capsys):
+    cache_dir = str(tmp_path)
+    article_cache.store(cache_dir, "ab12", "abelo")
+
+    def read_only(*args, **kwargs):
+        raise PermissionError(30, "Read-only file system")
+
+    # like a read-only file system, which also applies to root
+    monkeypatch.setattr(article_cache.os, "makedirs", read_only)
+    monkeypatch.setattr(article_cache.os, "utime", read_only)
+    article_cache.store(cache_dir, "ab34", "bovo")
+    article_cache.store(cache_dir, "cd56", "ĉevalo")
+    assert article_cache.load(cache_dir, "ab12") == "abelo"
+    assert article_cache.load(cache_dir, "ab34") is None
+    assert capsys.readouterr().out.count("Warning") == 1
+    assert sorted(os.listdir(tmp_path)) == ["ab"]
+    assert os.listdir(tmp_path / "ab") == ["ab12.pickle"]
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache_dir = str(tmp_path)
+    for n, key in enumerate(["aa", "bb", "cc"]):
+        article_cache.store(cache_dir, key, "x" * 1000)
+        os.utime(article_cache.cache_path(cache_dir, key), (n, n))
+    size = os.path.getsize(article_cache.cache_path(cache_dir, "aa"))
+
+    # loading "aa" makes it the most recently used
+    assert article_cache.load(cache_dir, "aa") is not None
+    assert article_cache.evict(cache_dir, 2 * size) == 1
+    assert article_cache.load(cache_dir, "bb") is None
+    assert article_cache.load(cache_dir, "aa") is not None
+    assert article_cache.load(cache_dir, "cc") is not None
+    assert article_cache.evict(cache_dir, 2 * size) == 0
+
+
+def test_cache_key_ignores_database_code(monkeypatch):
+    def fake_hash(edited):
+        # stands for the content of every file, changed for the edited ones
+        return lambda filename: filename + ("-edited" if filename in edited else "")
+
+    def key_with(edited):
+        monkeypatch.setattr(article_cache, "file_hash", fake_hash(edited))
+        article_cache.parser_version.cache_clear()
+        return article_cache.cache_key(data_hash(b"<art/>"))
+
+    try:
+        key = key_with([])
+        assert key_with(database_files()) == key
+        parser = [name for name in parser_files() if name.endswith("entries.py")]
+        assert parser and key_with(parser) != key
+    finally:
+        article_cache.parser_version.cache_clear()
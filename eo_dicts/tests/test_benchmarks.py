@@ -0,0 +1,42 @@
+import xml.etree.ElementTree as ET
+
+from benchmarks.corpus import generate_corpus
+from benchmarks.bench_parser import run
+from benchmarks import bench_lookup
+from ..parser import revo
+from .test_search import build_test_db
+
+
+def test_corpus_is_deterministic():
+    assert generate_corpus(3, seed=5) == generate_corpus(3, seed=5)
+    assert generate_corpus(3, seed=5) != generate_corpus(3, seed=6)
+
+
+def test_corpus_parses():
+    for depth in range(3):
+        for text in generate_corpus(5, depth=depth, langs=4):
+            art = revo.Art(ET.fromstring(text).find("art"))
+            for drv in art.derivations():
+                assert drv.to_text().string
+            assert any(art.translations())
+
+
+def test_bench_parser():
+    results = run(articles=2, repeat=1)
+    assert [res["name"] for res in results] == [
+        "parse_article",
+        "parse[lxml]",
+        "Drv.to_text",
+        "translations",
+        "expand_tld",
+        "expand_tld[scan]",
+    ]
+    assert all(res["ops_per_s"] > 0 for res in results)
+
+
+def test_bench_lookup(tmp_path):
+    db = str(tmp_path / "test.db")
+    build_test_db(db)
+    results = bench_lookup.run(db, lookups=20, repeat=1)
+    assert [res["name"] for res in results] == ["lookup[sqlite]", "lookup[binary]"]
+    assert all(res["ops_per_s"] > 0 for res in results)
@@ -0,0 +1,99 @@
+import sqlite3
+import pytest
+from ..binary_dict import (
+    BinaryDict,
+    binary_dict_path,
+    encode_record,
+    write_binary_dict,
+)
+from ..compression import decompress, load_dictionary
+from ..search import search_word
+from ..parser.string_with_format import decode_format
+from .test_search import build_test_db
+
+
+def search_entries(cursor, word):
+    "The rows of search(), in the shape of the binary dictionary entries"
+    dictionary = load_dictionary(cursor)
+    return [
+        dict(
+            word=row["word"],
+            definition_id=row["definition_id"],
+            article_id=row["article_id"],
+            words=row["words"],
+            mark=row["mark"],
+            position=row["position"],
+            definition=decompress(row["definition"], dictionary),
+            format=decode_format(row["format"]),
+        )
+        for row in search_word(cursor, word)
+    ]
+
+
+@pytest.mark.parametrize(
+    "options", [{}, {"binary_format": True, "compress": True}], ids=["text", "packed"]
+)
+def test_binary_dict_matches_search(tmp_path, options):
+    db = str(tmp_path / "test.db")
+    build_test_db(db, **options)
+    write_binary_dict(db, binary_dict_path(db))
+    conn = sqlite3.connect(db)
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    words = [row[0] for row in cursor.execute("SELECT word FROM words")]
+    with BinaryDict(binary_dict_path(db)) as binary_dict:
+        assert len(binary_dict) == len(words)
+        for word in set(words) | {"", "ĉevalon", "zzz", "Ĉeval", "a"}:
+            assert binary_dict.lookup(word) == search_entries(cursor, word)
+        assert [entry["mark"] for entry in binary_dict.lookup("Ĉevalo")] == [
+            "cxeval.0o"
+        ]
+        assert binary_dict.lookup("kapro")[0]["words"] == "ĉevro, kapro"
+    conn.close()
+
+
+def test_binary_dict_duplicates(tmp_path):
+    db = str(tmp_path / "dup.db")
+    conn = sqlite3.connect(db)
+    conn.execute(
+        """CREATE TABLE definitions (id integer primary key, article_id integer,
+        words text, mark text, position integer, definition text, format text)"""
+    )
+    conn.execute(
+        "CREATE TABLE words (id integer primary key, word text, definition_id)"
+    )
+    conn.executemany(
+        "INSERT INTO definitions VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (3, 1, "bo", "b.0o", 1, "Unu.", ""),
+            (7, 2, "bo", "b.0o", 2, "Ĉirkaŭ", "tld:0,2"),
+        ],
+    )
+    conn.executemany(
+        "INSERT INTO words (id, word, definition_id) VALUES (?, ?, ?)",
+        [(1, "bo", 7), (2, "a", 3), (3, "bo", 3), (4, "ĉo", 7)],
+    )
+    conn.commit()
+    conn.close()
+    write_binary_dict(db, str(tmp_path / "dup.bin"))
+    with BinaryDict(str(tmp_path / "dup.bin")) as binary_dict:
+        entries = binary_dict.lookup("bo")
+        assert [entry["definition_id"] for entry in entries] == [7, 3]
+        assert entries[0]["format"] == {"tld": [(0, 2)]}
+        assert entries[0]["definition"] == "Ĉirkaŭ"
+        assert binary_dict.lookup("ĉo")[0]["position"] == 2
+        assert binary_dict.lookup("b") == []
+
+
+def test_encode_record_is_compact():
+    record = encode_record(1, 2, 3, "bo", "b.0o", "Unu.", {})
+    assert len(record) == 3 + 3 + 5 + 5
+    record = encode_record(1, 2, 3, "bo", "b.0o", "Unu.", {"tld": [(0, 2), (5, 9)]})
+    assert len(record) == 3 + 3 + 5 + 5 + 2 + 16
+
+
+def test_binary_dict_bad_file(tmp_path):
+    path = tmp_path / "bad.bin"
+    path.write_bytes(b"not a dictionary")
+    with pytest.raises(Exception, match="not a binary dictionary"):
+        BinaryDict(str(path))
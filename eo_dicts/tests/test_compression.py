@@ -0,0 +1,58 @@
+import sqlite3
+import pytest
+from ..cli import Vortaro
+from ..compression import compress, decompress, load_dictionary, train_dictionary
+from .test_process import TEST_DB, db_file
+
+TEXTS = [
+    "Besto el la familio de ĉevaloj, uzata por tiri ĉarojn.",
+    "Besto el la familio de bovoj, uzata por tiri plugilojn.",
+    "Ilo uzata por tranĉi lignon.",
+] * 3
+
+
+def test_train_dictionary():
+    dictionary = train_dictionary(TEXTS, size=40)
+    assert len(dictionary) <= 40
+    # the phrases that save the most are at the end
+    assert dictionary.endswith(b"uzata por tiri uzata por")
+    assert train_dictionary(["unu foje"]) == b""
+
+
+def test_compress_roundtrip():
+    dictionary = train_dictionary(TEXTS)
+    for text in TEXTS:
+        value = compress(text * 2, dictionary)
+        assert isinstance(value, bytes)
+        assert len(value) < len((text * 2).encode())
+        assert decompress(value, dictionary) == text * 2
+    # not worth compressing, stays as text
+    assert compress("a", dictionary) == "a"
+    assert decompress("a", None) == "a"
+
+
+def test_process_compress():
+    vortaro = Vortaro()
+    vortaro.process_revo(output_db=TEST_DB, min_entries_to_include_lang=1)
+    conn = sqlite3.connect(db_file())
+    expected = dict(conn.execute("SELECT id, definition FROM definitions"))
+    conn.close()
+
+    vortaro.process_revo(
+        output_db=TEST_DB, min_entries_to_include_lang=1, compress=True
+    )
+    conn = sqlite3.connect(db_file())
+    cursor = conn.cursor()
+    dictionary = load_dictionary(cursor)
+    assert dictionary
+    definitions = dict(cursor.execute("SELECT id, definition FROM definitions"))
+    conn.close()
+    assert any(isinstance(value, bytes) for value in definitions.values())
+    assert {
+        id: decompress(value, dictionary) for id, value in definitions.items()
+    } == expected
+
+
+def test_compress_with_fts():
+    with pytest.raises(Exception, match="can't be combined"):
+        Vortaro().process_revo(output_db=TEST_DB, compress=True, fts=True)
@@ -0,0 +1,92 @@
+import sqlite3
+import pytest
+from ..db_size import ObjectSize, diff_sizes, object_sizes
+
+
+@pytest.fixture
+def cursor():
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE words (id integer primary key, word text)")
+    cursor.executemany(
+        "INSERT INTO words (word) VALUES (?)", [("vorto%d" % n,) for n in range(1000)]
+    )
+    cursor.execute("CREATE INDEX index_word_words ON words (word)")
+    yield cursor
+    conn.close()
+
+
+def test_object_sizes(cursor):
+    sizes = {size["name"]: size for size in object_sizes(cursor)}
+    assert sizes.keys() == {"words", "index_word_words"}
+    page_size = cursor.execute("PRAGMA page_size").fetchone()[0]
+    for size in sizes.values():
+        assert size["rows"] == 1000
+        assert size["pages"] > 1
+        assert size["bytes"] == size["pages"] * page_size
+    assert sizes["index_word_words"]["type"] == "index"
+    assert sizes["index_word_words"]["table"] == "words"
+    # 'vortoN' plus the rowid in the index, plus the id in the table
+    assert 7 < sizes["words"]["avg_row_bytes"] < 12
+
+
+class NoDbstat:
+    "Cursor of an SQLite built without dbstat"
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self.connection = cursor.connection
+
+    def execute(self, query, *args):
+        if "dbstat" in query:
+            raise sqlite3.OperationalError("no such table: dbstat")
+        return self.cursor.execute(query, *args)
+
+
+def test_object_sizes_without_dbstat(cursor):
+    # definitions longer than a page have overflow pages, index entries too
+    cursor.execute("CREATE TABLE definitions (id integer primary key, text text)")
+    cursor.executemany(
+        "INSERT INTO definitions (text) VALUES (?)",
+        [("difino%d " % n * n * 10,) for n in range(200)],
+    )
+    cursor.execute("CREATE INDEX index_text_definitions ON definitions (text)")
+    # like the shadow tables of FTS5
+    cursor.execute(
+        "CREATE TABLE terms (term text, id integer, PRIMARY KEY (term, id))"
+        " WITHOUT ROWID"
+    )
+    cursor.executemany(
+        "INSERT INTO terms VALUES (?, ?)", [("termo%d" % n, n) for n in range(5000)]
+    )
+    sizes = object_sizes(cursor)
+    assert object_sizes(NoDbstat(cursor)) == sizes
+    rows = {size["name"]: size["rows"] for size in sizes}
+    assert rows["terms"] == 5000
+    assert rows["index_text_definitions"] == 200
+
+
+def size(name, size_bytes, rows):
+    return ObjectSize(
+        name=name,
+        type="table",
+        table=name,
+        pages=size_bytes // 4096,
+        bytes=size_bytes,
+        rows=rows,
+        avg_row_bytes=None,
+    )
+
+
+def test_diff_sizes():
+    old = [size("words", 8192, 10), size("examples", 4096, 5), size("same", 4096, 1)]
+    new = [
+        size("words", 40960, 50),
+        size("definitions_fts", 4096, 3),
+        size("same", 4096, 1),
+    ]
+    assert diff_sizes(old, new) == [
+        ("words", 8192, 40960, 10, 50),
+        ("definitions_fts", 0, 4096, 0, 3),
+        ("examples", 4096, 0, 5, 0),
+    ]
@@ -1,11 +1,17 @@
+from ..parser import revo
 from ..parser.revo import Art, Snc, Dif, Drv, Subart, Refgrp
 from lxml import etree
+from xml.sax.saxutils import escape
+import xml.etree.ElementTree as ET
 import pytest
 
 
-@pytest.fixture
-def parser():
-    return lambda xml: etree.fromstring(xml)
+@pytest.fixture(params=["etree", "lxml"])
+def parser(request):
+    if request.param == "lxml":
+        lxml_parser = revo.make_lxml_parser({})
+        return lambda xml: etree.fromstring(xml, lxml_parser)
+    return lambda xml: ET.fromstring(xml)
 
 
 def test_set_parent(parser):
@@ -344,3 +350,171 @@ def test_refgrp_arrow(parser):
         <ref cel="plagx.0o">plaĝo</ref>
     </refgrp>"""
     assert Refgrp(parser(xml)).to_text().string == "→ plaĝo"
+
+
+def test_unknown_tag(parser):
+    xml = """<drv mrk="brik.0o">
+        <kap><tld/>o</kap>
+        <dif>Briko <nekonata>nova</nekonata></dif>
+    </drv>"""
+    with pytest.raises(Exception, match="Unknown tag <nekonata>"):
+        Drv(parser(xml), {"radix": "brik"})
+
+
+def test_nodes_have_slots(parser):
+    xml = """<drv mrk="brik.0o">
+        <kap><tld/>o</kap>
+        <snc mrk="brik.0o.konstru"><dif>Briko</dif></snc>
+    </drv>"""
+    drv = Drv(parser(xml), {"radix": "brik"})
+    snc = next(drv.get(Snc))
+    assert not hasattr(drv, "__dict__")
+    assert not hasattr(snc, "__dict__")
+    assert repr(snc).startswith("<Snc children=[<Dif children=['Briko']>] mrk=")
+
+
+def test_drv_parent_and_text_cache(parser):
+    xml = """<art>
+    <kap><rad>brik</rad>/o</kap>
+    <drv mrk="brik.0o">
+        <kap><tld/>o</kap>
+        <snc mrk="brik.0o.konstru"><dif>Briko</dif></snc>
+        <snc mrk="brik.0o.formo"><dif>Bloko</dif></snc>
+    </drv>
+    </art>"""
+    art = Art(parser(xml))
+    drv = next(art.derivations())
+    assert drv.parent is art
+    assert [snc.mrk for snc in drv.get_list(Snc)] == [
+        "brik.0o.konstru",
+        "brik.0o.formo",
+    ]
+    assert all(snc.parent is drv for snc in drv.get_list(Snc))
+
+    text = drv.to_text()
+    assert text.string == "1. Briko\n\n2. Bloko"
+    text.prepend("modified ")
+    assert drv.to_text().string == "1. Briko\n\n2. Bloko"
+
+
+def test_trd_snc_index_positional(parser):
+    xml = """<drv mrk="brik.0o">
+        <kap><tld/>o</kap>
+        <trd lng="de">Ziegel</trd>
+        <snc mrk="brik.0o.konstru">
+            <trd lng="en">brick</trd>
+            <trdgrp lng="fr"><trd>brique</trd>, <trd>carreau</trd></trdgrp>
+            <subsnc><trd lng="en">skipped</trd></subsnc>
+        </snc>
+        <snc mrk="brik.0o.FIG"></snc>
+        <snc mrk="brik.0o.formo">
+            <trd lng="fr">bloc</trd>
+            <trd lng="en">block</trd>
+        </snc>
+    </drv>"""
+    drv = Drv(parser(xml), {"radix": "brik"})
+    expected = {
+        "briko": {
+            "de": {None: ["Ziegel"]},
+            "en": {1: ["brick"], 3: ["block"]},
+            "fr": {1: ["brique", "carreau"], 3: ["bloc"]},
+        }
+    }
+    assert drv.translations() == expected
+    assert list(drv.translations()["briko"]) == ["de", "en", "fr"]
+    snc = drv.get_list(Snc)[2]
+    assert snc.translations() == {"briko": {"fr": {3: ["bloc"]}, "en": {3: ["block"]}}}
+
+
+def test_resolve_entities():
+    entities = {"ccirc": "ĉ", "FE": 'fundamenta "ekzemplo" &amp; <tld/>'}
+    xml = '<ekz x="&FE;">&ccirc;io &FE; &amp; &lt; &#x0109; &nekonata;</ekz>'
+    resolved = revo.resolve_entities(
+        xml, {name: escape(value, {'"': "&quot;"}) for name, value in entities.items()}
+    )
+    assert resolved.endswith("&amp; &lt; &#x0109; &nekonata;</ekz>")
+    node = etree.fromstring(resolved.replace("&nekonata;", ""))
+    assert node.get("x") == entities["FE"]
+    assert node.text == "ĉio %s & < ĉ " % entities["FE"]
+
+
+def test_load_entities(tmp_path, monkeypatch):
+    dtd_dir = tmp_path / "dtd"
+    dtd_dir.mkdir()
+    for name in revo.DTD_FILES:
+        (dtd_dir / name).write_text('<!ENTITY %s "&#x0109;">\n' % name[4:7])
+    filename = str(tmp_path / "cache" / "entities.json")
+
+    expected = {"sgn": "ĉ", "url": "ĉ", "mll": "ĉ"}
+    assert revo.load_entities(str(dtd_dir), filename) == expected
+
+    # unchanged DTDs are not parsed again
+    def compile_entities(dtd_dir):
+        raise Exception("DTDs parsed")
+
+    monkeypatch.setattr(revo, "compile_entities", compile_entities)
+    assert revo.load_entities(str(dtd_dir), filename) == expected
+
+    # a new version of compile_entities is compiled again
+    monkeypatch.setattr(revo, "ENTITIES_VERSION", revo.ENTITIES_VERSION + 1)
+    with pytest.raises(Exception, match="DTDs parsed"):
+        revo.load_entities(str(dtd_dir), filename)
+    monkeypatch.undo()
+    assert revo.load_entities(str(dtd_dir), filename) == expected
+
+    (dtd_dir / "vokourl.dtd").write_text('<!ENTITY url "https://">\n')
+    monkeypatch.setattr(revo, "compile_entities", compile_entities)
+    with pytest.raises(Exception, match="DTDs parsed"):
+        revo.load_entities(str(dtd_dir), filename)
+
+
+def test_load_entities_unwritable_cache(tmp_path, capsys):
+    dtd_dir = tmp_path / "dtd"
+    dtd_dir.mkdir()
+    for name in revo.DTD_FILES:
+        (dtd_dir / name).write_text('<!ENTITY %s "&#x0109;">\n' % name[4:7])
+    # the cache directory can't be created, a file is in the way
+    (tmp_path / "cache").write_text("")
+    filename = str(tmp_path / "cache" / "entities.json")
+
+    expected = {"sgn": "ĉ", "url": "ĉ", "mll": "ĉ"}
+    assert revo.load_entities(str(dtd_dir), filename) == expected
+    assert "can't write" in capsys.readouterr().out
+
+
+def test_backends_same_tree():
+    entities = {"ccirc": "ĉ", "FE": "fundamenta ekzemplo", "amp2": "&amp; <b>"}
+    xml = """<?xml version="1.0" encoding="UTF-8"?>
+    <!DOCTYPE vortaro SYSTEM "../dtd/vokoxml.dtd">
+    <vortaro>
+    <art mrk="$Id: cxeval.xml$">
+    <kap><rad>&ccirc;eval</rad>/o</kap>
+    <!-- komento -->
+    <drv mrk="cxeval.0o">
+        <kap><tld/>o</kap>
+        <snc>
+            <dif>Besto <?pi x?>&FE; &amp2;:
+                <ekz><tld/>o &ccirc;arma<!-- komento -->s.</ekz>
+            </dif>
+            <trd lng="en">horse</trd>
+        </snc>
+    </drv>
+    </art>
+    </vortaro>"""
+    etree_art = Art(
+        ET.fromstring(
+            revo.resolve_entities(
+                xml,
+                {name: escape(value) for name, value in entities.items()},
+            )
+        ).find("art")
+    )
+    lxml_art = Art(
+        etree.fromstring(xml.encode(), revo.make_lxml_parser(entities)).find("art")
+    )
+    assert repr(lxml_art) == repr(etree_art)
+    (drv,) = lxml_art.derivations()
+    assert (
+        drv.to_text().string == "Besto fundamenta ekzemplo &amp; <b>: \nĉevalo ĉarmas."
+    )
+    assert drv.translations() == next(etree_art.derivations()).translations()
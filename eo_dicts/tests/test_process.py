@@ -1,8 +1,17 @@
 import os
 import sqlite3
+import tarfile
+import zipfile
 import pytest
-from ..utils import output_dir
+from ..utils import collation_key, output_dir
 from ..cli import Vortaro
+from .. import article_cache
+from ..binary_dict import BinaryDict, binary_dict_path
+from ..manifest import data_hash, database_files, load_manifest, manifest_filename
+from ..process_revo import sort_entries
+from ..sources import ArticleFile, DirectorySource
+from ..parser.string_with_format import decode_format
+from .test_binary_dict import search_entries
 
 TEST_DB = "test.db"
 XML_BASE_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "revo", "xml")
@@ -51,3 +60,357 @@ def test_process_subart_2(vortaro):
         ("malaliĝi", 5),
         ("realiĝi", 6),
     ]
+
+
+def dump_db(filename):
+    conn = sqlite3.connect(filename)
+    try:
+        tables = [
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' ORDER BY name"
+            )
+        ]
+        return {table: list(conn.execute(f"SELECT * FROM {table}")) for table in tables}
+    finally:
+        conn.close()
+
+
+def test_process_parallel_jobs(vortaro):
+    vortaro.process_revo(output_db=TEST_DB, limit=30, min_entries_to_include_lang=1)
+    serial = dump_db(db_file())
+    vortaro.process_revo(
+        output_db=TEST_DB, limit=30, min_entries_to_include_lang=1, jobs=3
+    )
+    assert dump_db(db_file()) == serial
+
+
+def test_process_lxml_backend(vortaro):
+    vortaro.process_revo(output_db=TEST_DB, limit=30, min_entries_to_include_lang=1)
+    expected = dump_db(db_file())
+    vortaro.process_revo(
+        output_db=TEST_DB, limit=30, min_entries_to_include_lang=1, xml_backend="lxml"
+    )
+    assert dump_db(db_file()) == expected
+
+
+def test_process_binary_format(vortaro):
+    vortaro.process_revo(output_db=TEST_DB, limit=30, min_entries_to_include_lang=1)
+    conn = sqlite3.connect(db_file())
+    expected = dict(conn.execute("SELECT id, format FROM definitions"))
+    conn.close()
+
+    vortaro.process_revo(
+        output_db=TEST_DB, limit=30, min_entries_to_include_lang=1, binary_format=True
+    )
+    conn = sqlite3.connect(db_file())
+    formats = dict(conn.execute("SELECT id, format FROM definitions"))
+    conn.close()
+    assert formats.keys() == expected.keys()
+    for definition_id, data in formats.items():
+        assert isinstance(data, bytes)
+        assert decode_format(data) == decode_format(expected[definition_id])
+
+
+def test_process_binary_dict(vortaro):
+    vortaro.process_revo(
+        output_db=TEST_DB, limit=30, min_entries_to_include_lang=1, binary_dict=True
+    )
+    conn = sqlite3.connect(db_file())
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    words = {row[0] for row in cursor.execute("SELECT word FROM words")}
+    with BinaryDict(binary_dict_path(db_file())) as binary_dict:
+        for word in words:
+            assert binary_dict.lookup(word) == search_entries(cursor, word)
+    conn.close()
+
+
+def test_process_bulk_load(vortaro):
+    vortaro.process_revo(output_db=TEST_DB, limit=30, min_entries_to_include_lang=1)
+    row_by_row = dump_db(db_file())
+    vortaro.process_revo(
+        output_db=TEST_DB, limit=30, min_entries_to_include_lang=1, bulk=True
+    )
+    assert dump_db(db_file()) == row_by_row
+
+
+def normalized_db(filename):
+    "DB contents without the surrogate ids, which depend on insertion order"
+    conn = sqlite3.connect(filename)
+    try:
+        definitions = sorted(
+            conn.execute(
+                "SELECT words, mark, position, definition, format FROM definitions"
+            )
+        )
+        words = sorted(
+            conn.execute(
+                """SELECT w.word, d.mark, d.words FROM words w
+                JOIN definitions d ON (w.definition_id = d.id)"""
+            )
+        )
+        languages = list(conn.execute("SELECT code, name, num_entries FROM languages"))
+        translations = {
+            code: sorted(
+                conn.execute(
+                    f"""SELECT d.mark, t.snc_index, t.word, t.translation
+                    FROM translations_{code} t
+                    JOIN definitions d ON (t.definition_id = d.id)"""
+                )
+            )
+            for code, _, _ in languages
+        }
+        return definitions, words, languages, translations
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("bulk", [False, True])
+def test_process_incremental(vortaro, tmp_path, capsys, bulk):
+    originals = sorted(os.listdir(XML_BASE_DIR))[:6]
+    for name in originals:
+        (tmp_path / name).write_bytes(
+            open(os.path.join(XML_BASE_DIR, name), "rb").read()
+        )
+
+    vortaro.process_revo(
+        output_db=TEST_DB, min_entries_to_include_lang=1, source=str(tmp_path)
+    )
+    conn = sqlite3.connect(db_file())
+    article_ids = dict(conn.execute("SELECT mark, article_id FROM definitions"))
+    conn.close()
+
+    # change one article, remove another and add a new one
+    changed = tmp_path / originals[1]
+    changed.write_text(changed.read_text().replace("</dif>", " Ŝanĝita.</dif>", 1))
+    (tmp_path / originals[2]).unlink()
+    new_name = sorted(os.listdir(XML_BASE_DIR))[6]
+    (tmp_path / new_name).write_bytes(
+        open(os.path.join(XML_BASE_DIR, new_name), "rb").read()
+    )
+
+    capsys.readouterr()
+    vortaro.process_revo(
+        output_db=TEST_DB,
+        min_entries_to_include_lang=1,
+        incremental=True,
+        bulk=bulk,
+        source=str(tmp_path),
+    )
+    assert "Articles changed: 1, added: 1, removed: 1" in capsys.readouterr().out
+    incremental = normalized_db(db_file())
+    conn = sqlite3.connect(db_file())
+    for mark, article_id in conn.execute("SELECT mark, article_id FROM definitions"):
+        if mark in article_ids:
+            assert article_ids[mark] == article_id
+    conn.close()
+
+    vortaro.process_revo(
+        output_db=TEST_DB, min_entries_to_include_lang=1, source=str(tmp_path)
+    )
+    assert incremental == normalized_db(db_file())
+
+
+def test_process_incremental_manifest_not_saved(vortaro, tmp_path, capsys, monkeypatch):
+    from .. import process_revo
+
+    names = sorted(os.listdir(XML_BASE_DIR))[:7]
+    for name in names[:6]:
+        (tmp_path / name).write_bytes(
+            open(os.path.join(XML_BASE_DIR, name), "rb").read()
+        )
+    options = dict(
+        output_db=TEST_DB, min_entries_to_include_lang=1, source=str(tmp_path)
+    )
+    vortaro.process_revo(**options)
+    (tmp_path / names[6]).write_bytes(
+        open(os.path.join(XML_BASE_DIR, names[6]), "rb").read()
+    )
+
+    # dies right after the new database replaced the previous one
+    def save_manifest(filename, manifest):
+        raise Exception("Killed")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(process_revo, "save_manifest", save_manifest)
+        with pytest.raises(Exception, match="Killed"):
+            vortaro.process_revo(incremental=True, **options)
+
+    capsys.readouterr()
+    vortaro.process_revo(incremental=True, **options)
+    out = capsys.readouterr().out
+    assert "The manifest doesn't match the database, doing a full build" in out
+    incremental = normalized_db(db_file())
+    vortaro.process_revo(**options)
+    assert incremental == normalized_db(db_file())
+
+
+def test_process_incremental_fts(vortaro, tmp_path):
+    for name in sorted(os.listdir(XML_BASE_DIR))[:6]:
+        (tmp_path / name).write_bytes(
+            open(os.path.join(XML_BASE_DIR, name), "rb").read()
+        )
+    options = dict(
+        output_db=TEST_DB, min_entries_to_include_lang=1, fts=True, source=str(tmp_path)
+    )
+    vortaro.process_revo(**options)
+
+    changed = sorted(tmp_path.glob("*.xml"))[0]
+    changed.write_text(
+        changed.read_text().replace("</ekz>", " ŝanĝita</ekz>", 1), encoding="utf-8"
+    )
+    vortaro.process_revo(incremental=True, **options)
+    conn = sqlite3.connect(db_file())
+    examples = sorted(conn.execute("SELECT example FROM examples"))
+    found = list(
+        conn.execute("SELECT * FROM examples_fts WHERE example MATCH 'sangita'")
+    )
+    conn.close()
+    assert len(found) == 1
+
+    vortaro.process_revo(**options)
+    conn = sqlite3.connect(db_file())
+    assert examples == sorted(conn.execute("SELECT example FROM examples"))
+    conn.close()
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_process_cache(vortaro, tmp_path, monkeypatch, jobs):
+    from .. import process_revo
+
+    files = sorted(
+        os.path.join(XML_BASE_DIR, name) for name in os.listdir(XML_BASE_DIR)
+    )
+    selected = files[:6]
+
+    def list_files(xml_file, source):
+        return [ArticleFile(DirectorySource(XML_BASE_DIR), name) for name in selected]
+
+    monkeypatch.setattr(process_revo, "list_files", list_files)
+    monkeypatch.setattr(process_revo, "article_cache_dir", lambda: str(tmp_path))
+    vortaro.process_revo(output_db=TEST_DB, min_entries_to_include_lang=1, cache=True)
+
+    # without the first article, every other one gets a different number
+    selected = files[1:6]
+    vortaro.process_revo(output_db=TEST_DB, min_entries_to_include_lang=1)
+    expected = dump_db(db_file())
+
+    def parse_article_text(article, filename, num_article, xml_backend="etree"):
+        raise Exception("Not cached: %s" % filename)
+
+    # edits to the schema or the insert code keep the cache
+    real_hash = article_cache.file_hash
+    monkeypatch.setattr(
+        article_cache,
+        "file_hash",
+        lambda filename: (
+            real_hash(filename) + ("-edited" if filename in database_files() else "")
+        ),
+    )
+    article_cache.parser_version.cache_clear()
+    monkeypatch.setattr(process_revo, "parse_article_text", parse_article_text)
+    try:
+        vortaro.process_revo(
+            output_db=TEST_DB, min_entries_to_include_lang=1, cache=True, jobs=jobs
+        )
+    finally:
+        article_cache.parser_version.cache_clear()
+    assert dump_db(db_file()) == expected
+
+
+def write_archive(path, kind):
+    "The fixture articles laid out like the Revo release, plus a non-article"
+    names = sorted(os.listdir(XML_BASE_DIR))
+    if kind == "zip":
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+            for name in names:
+                archive.write(
+                    os.path.join(XML_BASE_DIR, name), "revo-fonto/revo/" + name
+                )
+            archive.writestr("revo-fonto/cfg/lingvoj.xml", "<lingvoj/>")
+        return
+    with tarfile.open(path, "w:gz" if kind == "tar.gz" else "w") as archive:
+        for name in names:
+            archive.add(os.path.join(XML_BASE_DIR, name), "revo-fonto/revo/" + name)
+
+
+@pytest.mark.parametrize(
+    "kind,jobs", [("zip", 1), ("zip", 3), ("tar", 3), ("tar.gz", 2)]
+)
+def test_process_archive(vortaro, tmp_path, kind, jobs):
+    vortaro.process_revo(output_db=TEST_DB, limit=30, min_entries_to_include_lang=1)
+    expected = dump_db(db_file())
+
+    archive = tmp_path / ("revoxml." + kind)
+    write_archive(archive, kind)
+    vortaro.process_revo(
+        output_db=TEST_DB,
+        limit=30,
+        min_entries_to_include_lang=1,
+        jobs=jobs,
+        source=str(archive),
+    )
+    assert dump_db(db_file()) == expected
+
+
+@pytest.mark.parametrize("buffer_size", [0, 1, 2, 3, 100])
+def test_sort_entries_external(buffer_size):
+    words = ["ĉevalo", "Abelo", "abelo", "zebro", "Abelo", "dento", "ĉevalo", "celo"]
+    entries = [dict(article_id=n, word=word) for n, word in enumerate(words)]
+    result = list(sort_entries(iter(entries), buffer_size))
+    assert result == sorted(entries, key=lambda x: collation_key(x["word"]))
+    assert [entry["word"] for entry in result] == [
+        "Abelo",
+        "abelo",
+        "Abelo",
+        "celo",
+        "ĉevalo",
+        "ĉevalo",
+        "dento",
+        "zebro",
+    ]
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_process_reads_articles_once(vortaro, monkeypatch, jobs):
+    reads = []
+    read = DirectorySource.read
+
+    def counting_read(self, name):
+        # workers are forked and append to their own copy of the list
+        reads.append(name)
+        return read(self, name)
+
+    monkeypatch.setattr(DirectorySource, "read", counting_read)
+    vortaro.process_revo(
+        output_db=TEST_DB, limit=8, min_entries_to_include_lang=1, jobs=jobs
+    )
+    manifest = load_manifest(manifest_filename(db_file()))
+    assert manifest is not None
+    names = sorted(os.listdir(XML_BASE_DIR))[:7]
+    # the main process only reads the articles when it parses them itself
+    expected = [] if jobs > 1 else names
+    assert sorted(os.path.basename(name) for name in reads) == expected
+    for name in names:
+        with open(os.path.join(XML_BASE_DIR, name), "rb") as f:
+            assert manifest["articles"][name]["hash"] == data_hash(f.read())
+
+
+def test_process_failed_build_keeps_db(vortaro, monkeypatch):
+    from .. import process_revo
+
+    vortaro.process_revo(output_db=TEST_DB, limit=5, min_entries_to_include_lang=1)
+    previous = dump_db(db_file())
+    vortaro.process_revo(output_db=TEST_DB, limit=5, dry_run=True)
+    assert dump_db(db_file()) == previous
+
+    def parse_article(file, num_article, cache_dir=None, xml_backend="etree"):
+        raise Exception("Broken article")
+
+    monkeypatch.setattr(process_revo, "parse_article", parse_article)
+    with pytest.raises(Exception, match="Broken article"):
+        vortaro.process_revo(output_db=TEST_DB, limit=5)
+
+    assert dump_db(db_file()) == previous
+    assert not [name for name in os.listdir(output_dir()) if name.endswith(".tmp")]
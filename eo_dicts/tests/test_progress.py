@@ -0,0 +1,52 @@
+import io
+from ..progress import Progress, QUIET, PROGRESS, VERBOSE
+
+
+def test_quiet():
+    stream = io.StringIO()
+    progress = Progress(QUIET, stream=stream)
+    progress.start("parse", 10)
+    progress.update()
+    progress.trace("abak.xml abak.0o")
+    progress.message("en 100")
+    progress.finish()
+    assert stream.getvalue() == ""
+
+
+def test_progress_is_rate_limited():
+    stream = io.StringIO()
+    progress = Progress(PROGRESS, interval=3600, stream=stream)
+    progress.start("parse", 1000)
+    for _ in range(1000):
+        progress.trace("abak.xml abak.0o")
+        progress.update()
+    assert stream.getvalue() == ""
+    progress.finish()
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    assert lines[0].startswith("parse: 1000/1000 (100.0%)")
+
+
+def test_progress_eta():
+    stream = io.StringIO()
+    progress = Progress(PROGRESS, interval=0, stream=stream)
+    progress.start("parse", 4)
+    progress.update()
+    assert "parse: 1/4 (25.0%)" in stream.getvalue()
+    assert "ETA" in stream.getvalue()
+
+
+def test_verbose_trace_is_buffered():
+    stream = io.StringIO()
+    progress = Progress(VERBOSE, stream=stream, trace_buffer_size=3)
+    progress.start("insert")
+    progress.trace("abako")
+    progress.trace("abato")
+    assert stream.getvalue() == ""
+    progress.trace("briko")
+    assert stream.getvalue() == "abako\nabato\nbriko\n"
+    progress.trace("domo")
+    progress.finish()
+    lines = stream.getvalue().splitlines()
+    assert lines[:4] == ["abako", "abato", "briko", "domo"]
+    assert lines[4].startswith("insert: 0, ")
@@ -0,0 +1,269 @@
+import sqlite3
+import pytest
+from .. import process_revo
+from ..search import (
+    browse_query,
+    browse_words,
+    fulltext_query,
+    prefix_query,
+    search_definitions,
+    search_examples,
+    search_prefix,
+    search_translations,
+    translation_query,
+)
+from ..process_revo import (
+    RowWriter,
+    create_db,
+    create_fulltext_index,
+    create_index,
+    create_langs_tables,
+    create_translations_staging,
+    insert_definitions,
+    insert_translations,
+    sort_entries,
+    stage_translations,
+)
+from ..compression import compress_definitions
+from ..parser.string_with_format import decode_format
+from ..utils import collation_key
+
+# the languages of lingvoj.xml, which isn't there without the revo submodule
+LANGUAGES = [{"code": "en", "name": "angla"}, {"code": "eo", "name": "esperanto"}]
+
+
+def article(article_id, drvs):
+    """Entries of an article like parse_article_text gives them, from a list of
+    (words, mark, definition, format, trads) per drv"""
+    entries = []
+    for position, (words, mark, text, format, trads) in enumerate(drvs, 1):
+        definition = dict(
+            article_id=article_id,
+            word=words,
+            mark=mark,
+            definition=text,
+            format=format,
+            trads=trads,
+            position=position,
+            is_copy=False,
+        )
+        for word in words.split(", "):
+            entries.append(
+                dict(article_id=article_id, word=word, definition=definition)
+            )
+            definition = dict(definition, trads={}, is_copy=True)
+    return entries
+
+
+ENTRIES = (
+    article(1, [("-an", "an.0", "Sufikso por membro de grupo, ĉiu ano.", "", {})])
+    + article(
+        2,
+        [
+            (
+                "briko",
+                "brik.0o",
+                "Kapro. \nbrikoj kaj brikidoj",
+                "tld:8,14;19,27\nekz:8,27",
+                {"briko": {"en": {None: ["brick"]}}},
+            )
+        ],
+    )
+    + article(
+        3,
+        [
+            (
+                "Ĉevalo",
+                "cxeval.0o",
+                "Granda hejma besto: \nrajdi sur Ĉevalo.",
+                "fako:0,6\nekz:21,37",
+                {"Ĉevalo": {"en": {None: ["horse"]}, "eo": {None: ["ĉevalo"]}}},
+            ),
+            ("Ĉevalino", "cxeval.0ino", "Ina ĉevalo.", "", {}),
+        ],
+    )
+    + article(
+        4,
+        [
+            (
+                "ĉevro, kapro",
+                "cxevr.0o",
+                "Besto kun kornoj, amas grimpi.",
+                "bold:0,5",
+                {"ĉevro": {"en": {1: ["goat"], 2: ["goat"], 3: ["goat", "kid"]}}},
+            )
+        ],
+    )
+    + article(5, [("abelo", "abel.0o", "Insekto, kiu faras mielon.", "", {})])
+    + article(6, [("zebro", "zebr.0o", "Strie besto.", "", {})])
+)
+
+
+def build_test_db(
+    filename, fts=False, binary_format=False, compress=False, entries=ENTRIES
+):
+    """A database of the entries, written by the same code as process_revo,
+    without reading the revo submodule"""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(process_revo, "get_languages", lambda: LANGUAGES)
+        conn = create_db(filename, binary_format=binary_format)
+        cursor = conn.cursor()
+        create_translations_staging(cursor)
+        entries_per_lang = insert_definitions(
+            sort_entries(entries, 0), RowWriter(cursor), binary_format
+        )
+        create_langs_tables(cursor, entries_per_lang)
+        insert_translations(cursor, entries_per_lang)
+        create_index(cursor)
+        if fts:
+            create_fulltext_index(cursor)
+        if compress:
+            compress_definitions(cursor)
+        conn.commit()
+        conn.close()
+
+
+@pytest.fixture(scope="module")
+def cursor(tmp_path_factory):
+    filename = str(tmp_path_factory.mktemp("search") / "search.db")
+    build_test_db(filename, fts=True)
+    conn = sqlite3.connect(filename)
+    conn.row_factory = sqlite3.Row
+    yield conn.cursor()
+    conn.close()
+
+
+def test_fulltext_query():
+    assert fulltext_query("cxevalo  bru*") == '"ĉevalo" "bru"*'
+    assert fulltext_query('a"b *') == '"a""b"'
+
+
+def test_search_definitions_diacritics(cursor):
+    for query in ["ĉiu", "cxiu", "ciu", "ĈIU"]:
+        assert [row["mark"] for row in search_definitions(cursor, query)] == ["an.0"]
+    assert search_definitions(cursor, "ĉiu nenie") == []
+
+
+def test_search_definitions_copies(cursor):
+    # the copies of a definition for the other words of a drv aren't indexed
+    rows = search_definitions(cursor, "a*", limit=1000)
+    marks = [row["mark"] for row in rows]
+    assert len(marks) == len(set(marks))
+
+
+def test_search_examples(cursor):
+    rows = search_examples(cursor, "brik*")
+    assert [row["example"] for row in rows] == ["[brikoj] kaj [brikidoj]"]
+
+
+def test_examples_from_format(cursor):
+    examples = sorted(row[0] for row in cursor.execute("SELECT example FROM examples"))
+    expected = set()
+    for definition, format in cursor.execute(
+        "SELECT definition, format FROM definitions"
+    ):
+        for start, end in decode_format(format).get("ekz", []):
+            expected.add(definition[start:end])
+    assert set(examples) == expected
+
+
+def test_search_prefix(cursor):
+    words = ["Ĉevalino", "Ĉevalo", "ĉevro"]
+    for prefix in ["ĉev", "cxev", "cev", "ĈEV"]:
+        assert [row["word"] for row in search_prefix(cursor, prefix)] == words
+    assert [row["word"] for row in search_prefix(cursor, "cxev", limit=2)] == words[:2]
+    assert search_prefix(cursor, "cxevz") == []
+    assert len(search_prefix(cursor, "", limit=3)) == 3
+
+
+def test_search_prefix_uses_index(cursor):
+    query, params = prefix_query("cxev", 10)
+    plan = [row[3] for row in cursor.execute("EXPLAIN QUERY PLAN " + query, params)]
+    assert "INDEX index_key_words (key>? AND key<?)" in plan[0]
+    assert not [step for step in plan if "TEMP B-TREE" in step]
+
+
+def test_browse_words(cursor):
+    words = [row["word"] for row in cursor.execute("SELECT word FROM words")]
+    pages: list = []
+    after_key, after_id = None, None
+    while True:
+        page = browse_words(cursor, after_key, after_id, limit=7)
+        if not page:
+            break
+        assert len(page) <= 7
+        pages += page
+        after_key, after_id = page[-1]["sort_key"], page[-1]["id"]
+    assert [row["word"] for row in pages] == sorted(words, key=collation_key)
+    assert len({row["id"] for row in pages}) == len(words)
+
+    after = browse_words(cursor, collation_key("ĉevalo"))
+    assert after[0]["word"] == "ĉevro"
+    assert all(row["sort_key"] > collation_key("ĉevalo") for row in after)
+
+
+@pytest.mark.parametrize("after", [(None, None), ("x", None), ("x", 3)])
+def test_browse_query_uses_index(cursor, after):
+    query, params = browse_query(*after, limit=10)
+    plan = [row[3] for row in cursor.execute("EXPLAIN QUERY PLAN " + query, params)]
+    assert "index_sort_key_words" in plan[0]
+    assert not [step for step in plan if "TEMP B-TREE" in step]
+
+
+def test_search_translations(cursor):
+    for word in ["horse", "HORSE", "hórse"]:
+        rows = search_translations(cursor, "en", word)
+        assert [(row["translation"], row["mark"]) for row in rows] == [
+            ("horse", "cxeval.0o")
+        ]
+    rows = search_translations(cursor, "en", "go", prefix=True, limit=3)
+    assert [row["translation"] for row in rows] == ["goat"] * 3
+    assert search_translations(cursor, "en", "go") == []
+    with pytest.raises(Exception, match="not in the database"):
+        search_translations(cursor, "xx", "horse")
+    with pytest.raises(Exception, match="Invalid language"):
+        translation_query("en; DROP TABLE words", "horse")
+
+
+@pytest.fixture
+def translations_db(monkeypatch):
+    monkeypatch.setattr(process_revo, "get_languages", lambda: LANGUAGES)
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE definitions (id integer primary key, mark text)")
+    create_translations_staging(cursor)
+    create_langs_tables(cursor, {"en": 1})
+    writer = RowWriter(cursor)
+    for n in range(1, 200):
+        cursor.execute("INSERT INTO definitions (mark) VALUES (?)", ("mark%d" % n,))
+        trads = {"vorto%d" % n: {"en": {None: ["Word %d" % n, "other"]}}}
+        stage_translations(writer, n, trads)
+    insert_translations(cursor, ["en"])
+    conn.execute("ANALYZE")
+    yield cursor
+    conn.close()
+
+
+def query_plan(cursor, query, params):
+    return [row[3] for row in cursor.execute("EXPLAIN QUERY PLAN " + query, params)]
+
+
+@pytest.mark.parametrize("prefix", [False, True])
+def test_translation_query_uses_index(translations_db, prefix):
+    query, params = translation_query("en", "word 1", prefix)
+    plan = query_plan(translations_db, query, params)
+    assert "USING INDEX index_key_translations_en (key" in plan[0]
+    assert not [step for step in plan if "TEMP B-TREE" in step]
+    assert [row[0] for row in translations_db.execute(query, params)][:1] == ["Word 1"]
+
+
+def test_translations_by_definition_uses_index(translations_db):
+    plan = query_plan(
+        translations_db,
+        "SELECT translation FROM translations_en WHERE definition_id = ?",
+        (5,),
+    )
+    assert plan == [
+        "SEARCH translations_en USING INDEX "
+        "index_definition_id_translations_en (definition_id=?)"
+    ]
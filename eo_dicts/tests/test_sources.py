@@ -0,0 +1,91 @@
+import io
+import pickle
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import tarfile
+import zipfile
+import pytest
+from .. import sources
+from ..sources import (
+    DirectorySource,
+    TarSource,
+    ZipSource,
+    article_files,
+    open_source,
+    select_members,
+)
+
+ARTICLES = {"abak.xml": b"<vortaro>abako</vortaro>", "ab.xml": "ĉ".encode()}
+
+
+def test_select_members():
+    names = ["x/revo/b.xml", "x/cfg/lingvoj.xml", "x/revo/a.xml", "x/revo/README"]
+    assert select_members(names) == ["x/revo/a.xml", "x/revo/b.xml"]
+    assert select_members(["b.xml", "a.xml", "a.txt"]) == ["a.xml", "b.xml"]
+
+
+def write_tar(path, mode):
+    with tarfile.open(path, mode) as archive:
+        for name, data in ARTICLES.items():
+            info = tarfile.TarInfo("revo/" + name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+
+@pytest.mark.parametrize("kind", ["dir", "zip", "tar", "tar.gz"])
+def test_read_source(tmp_path, kind):
+    path = tmp_path / ("articles." + kind)
+    if kind == "dir":
+        path.mkdir()
+        for name, data in ARTICLES.items():
+            (path / name).write_bytes(data)
+    elif kind == "zip":
+        with zipfile.ZipFile(path, "w") as archive:
+            for name, data in ARTICLES.items():
+                archive.writestr("revo/" + name, data)
+    else:
+        write_tar(path, "w:gz" if kind == "tar.gz" else "w")
+
+    source = open_source(str(path))
+    expected_type = dict(dir=DirectorySource, zip=ZipSource)
+    assert isinstance(source, expected_type.get(kind, TarSource))
+    files = article_files(source)
+    assert [file.name.rsplit("/", 1)[-1] for file in files] == ["ab.xml", "abak.xml"]
+    # the workers get the files pickled
+    files = pickle.loads(pickle.dumps(files))
+    assert [file.read() for file in files] == [ARTICLES["ab.xml"], ARTICLES["abak.xml"]]
+    assert files[0].text() == "ĉ"
+
+
+def test_open_source_missing(tmp_path):
+    with pytest.raises(Exception, match="Can't read articles"):
+        open_source(str(tmp_path / "missing.zip"))
+
+
+def read_file(file):
+    return file.read()
+
+
+def test_compressed_tar_decompressed_once(tmp_path, monkeypatch):
+    path = tmp_path / "articles.tar.gz"
+    write_tar(path, "w:gz")
+    counter = tmp_path / "decompressions"
+    counter.write_text("")
+    tar_open = tarfile.open
+
+    def counting_open(name, mode="r", *args, **kwargs):
+        if mode == "r:*":
+            # appended to a file, to also count the ones of the workers
+            with open(counter, "a") as f:
+                f.write("%s\n" % name)
+        return tar_open(name, mode, *args, **kwargs)
+
+    monkeypatch.setattr(sources.tarfile, "open", counting_open)
+    files = article_files(open_source(str(path)))
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(max_workers=2, mp_context=context) as executor:
+        assert list(executor.map(read_file, files)) == [
+            ARTICLES["ab.xml"],
+            ARTICLES["abak.xml"],
+        ]
+    assert counter.read_text().splitlines() == [str(path)]
@@ -1,4 +1,12 @@
-from ..parser.string_with_format import StringWithFormat, Format, expand_tld
+import random
+from benchmarks.bench_parser import expand_tld_scan
+from ..parser.string_with_format import (
+    BOUNDARIES,
+    StringWithFormat,
+    Format,
+    decode_format,
+    expand_tld,
+)
 
 
 def test_init():
@@ -53,6 +61,27 @@ def test_prepend():
     assert string.format == {"italic": [(8, 14)]}
 
 
+def test_prepend_nested():
+    inner = StringWithFormat("a").add_italic("b").add("c")
+    inner.prepend("1. ")
+    outer = StringWithFormat().add_bold("X").add(inner)
+    outer.prepend("\n")
+    outer.add_italic("d")
+    assert len(outer) == 9
+    assert outer.string == "\nX1. abcd"
+    assert outer.format == {"bold": [(1, 2)], "italic": [(6, 7), (8, 9)]}
+    # adding doesn't change the added string
+    assert inner.string == "1. abc"
+    assert inner.format == {"italic": [(4, 5)]}
+
+
+def test_set_string():
+    string = StringWithFormat("Saluton").add(" mondo")
+    string.string = "Bonan tagon"
+    assert len(string) == 11
+    assert string.add("!").string == "Bonan tagon!"
+
+
 def test_strip_left():
     string = StringWithFormat()
     string.add_italic("  Bonan tagon")
@@ -83,6 +112,28 @@ def test_encode_format():
     assert s.encode_format() == "bold:0,5;11,12\nitalic:5,11"
 
 
+def test_encode_format_binary():
+    s = StringWithFormat().add_bold("Bonan").add_italic(" tagon").add_bold("!")
+    # bold: 2 spans, +0 5 long, +6 1 long; italic: 1 span, +5 6 long
+    assert s.encode_format_binary() == bytes([1, 2, 0, 10, 12, 2, 0, 1, 10, 12])
+    assert decode_format(s.encode_format_binary()) == s.format
+    assert decode_format(s.encode_format()) == s.format
+
+
+def test_decode_format_roundtrip():
+    formats = [
+        {},
+        {"ekz": []},
+        # out of order spans, and offsets that need several bytes
+        {"tld": [(300, 305), (2, 4), (70000, 70001)], "fako": [(5, 5)]},
+    ]
+    for format in formats:
+        s = StringWithFormat()
+        s.format = format
+        assert decode_format(s.encode_format()) == format
+        assert decode_format(s.encode_format_binary()) == format
+
+
 def test_expand_tld():
     s = StringWithFormat()
     s.add("amik", Format.TLD).add("eco, ge").add("patr", Format.TLD).add("oj")
@@ -121,3 +172,19 @@ def test_expand_tld_end2():
     s = expand_tld(s)
     assert s.string == "ab,"
     assert s.format == {"tld": [(0, 2)]}
+
+
+def test_expand_tld_same_as_scan():
+    rng = random.Random(1)
+    alphabet = "abĉŝ" + "".join(sorted(BOUNDARIES))
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 30)))
+        spans = []
+        for _ in range(rng.randint(1, 4)):
+            start = rng.randrange(len(text))
+            spans.append((start, rng.randint(start, len(text))))
+        s1 = StringWithFormat(text)
+        s1.format = {"tld": list(spans), "ekz": [(0, len(text))]}
+        s2 = StringWithFormat(text)
+        s2.format = {"tld": list(spans), "ekz": [(0, len(text))]}
+        assert expand_tld(s1).format == expand_tld_scan(s2).format, (text, spans)
@@ -0,0 +1,98 @@
+import pytest
+from .. import timing
+from ..timing import Timings
+
+
+class FakeClock:
+    "Stands for the time module, the clocks only move with advance()"
+
+    def __init__(self):
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def perf_counter(self) -> float:
+        return self.wall
+
+    def process_time(self) -> float:
+        return self.cpu
+
+    def advance(self, wall: float, cpu: float = 0.0) -> None:
+        self.wall += wall
+        self.cpu += cpu
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(timing, "time", clock)
+    return clock
+
+
+def test_nested_phases_are_exclusive(clock):
+    timings = Timings()
+    clock.advance(1)  # before any phase, not charged
+    with timings.phase("outer", 0):
+        clock.advance(0.25, 0.125)
+        with timings.phase("inner", 3):
+            clock.advance(0.5, 0.5)
+        clock.advance(0.25)
+    report = timings.report()
+    assert report["inner"] == {
+        "wall_s": 0.5,
+        "cpu_s": 0.5,
+        "items": 3,
+        "items_per_s": 6.0,
+    }
+    assert report["outer"] == {
+        "wall_s": 0.5,
+        "cpu_s": 0.125,
+        "items": 0,
+        "items_per_s": 0,
+    }
+
+
+def test_iterate_charges_producer(clock):
+    timings = Timings()
+
+    def produce():
+        for n in range(3):
+            clock.advance(0.5, 0.25)
+            yield n
+
+    with timings.phase("consumer", 0):
+        for _ in timings.iterate("producer", produce()):
+            clock.advance(0.125)
+    report = timings.report()
+    assert report["producer"]["items"] == 3
+    assert report["producer"]["wall_s"] == 1.5
+    assert report["producer"]["cpu_s"] == 0.75
+    assert report["consumer"]["wall_s"] == 0.375
+    assert report["consumer"]["cpu_s"] == 0
+
+
+def test_iterate_stops_on_error(clock):
+    timings = Timings()
+
+    def produce():
+        clock.advance(0.5)
+        yield 1
+        clock.advance(0.25)
+        raise ValueError("broken")
+
+    with pytest.raises(ValueError):
+        with timings.phase("consumer", 0):
+            for _ in timings.iterate("producer", produce()):
+                clock.advance(1)
+    assert timings.stack == []
+    assert timings.report()["producer"]["wall_s"] == 0.75
+    assert timings.report()["consumer"]["wall_s"] == 1
+
+
+def test_merge():
+    timings = Timings()
+    other = Timings()
+    with other.phase("xml", 2):
+        pass
+    timings.merge(other)
+    timings.merge(other)
+    assert timings.report()["xml"]["items"] == 4
@@ -1,4 +1,10 @@
-from ..utils import add_hats
+from ..utils import (
+    LANGUAGE_COLLATION,
+    add_hats,
+    collation_key,
+    fold_key,
+    prefix_range,
+)
 
 
 def test_add_hats():
@@ -6,3 +12,73 @@ def test_add_hats():
     assert add_hats("saluton") == "saluton"
     assert add_hats("sercxi") == "serĉi"
     assert add_hats("CxSxGxJxHxUxcxsxgxjxhxux") == "ĈŜĜĴĤŬĉŝĝĵĥŭ"
+
+
+def test_fold_key():
+    assert fold_key("Ĉevalo") == "cevalo"
+    assert fold_key("AŬTO") == "auto"
+    assert fold_key(add_hats("cxevalo")) == fold_key("ĉevalo")
+
+
+def test_prefix_range():
+    assert prefix_range("ceva") == ("ceva", "cevb")
+    assert prefix_range("") == ("", None)
+    lower, upper = prefix_range("ab")
+    assert all(lower <= key < upper for key in ["ab", "abako", "abz"])
+    assert not any(lower <= key < upper for key in ["aa", "ac", "a"])
+
+
+def test_collation_key():
+    words = [
+        "zebro",
+        "ĉevalo",
+        "Celo",
+        "dento",
+        "cxevalo",
+        "ŭo",
+        "uzi",
+        "ĥoro",
+        "hundo",
+    ]
+    assert sorted(words, key=collation_key) == [
+        "Celo",
+        "cxevalo",
+        "ĉevalo",
+        "dento",
+        "hundo",
+        "ĥoro",
+        "uzi",
+        "ŭo",
+        "zebro",
+    ]
+    assert collation_key("Ĉevalo") == collation_key("ĉevalo")
+    assert len(collation_key("ĉevalo").encode()) == len("ĉevalo")
+    assert collation_key("-an") < collation_key("a-b") < collation_key("ab")
+    assert collation_key("ab") < collation_key("a_b")
+
+
+def test_collation_key_language_names():
+    # the order of the previous get_languages key, "/" and "-" after the letters
+    alphabet = "abcĉdefgĝhĥijĵklmnoprsŝtuŭvz/-"
+    names = [
+        "malnov-angla",
+        "malnova",
+        "ĉina",
+        "angla",
+        "norvega/bokmal",
+        "norvega",
+        "norvega-ninorsk",
+        "cigana",
+    ]
+
+    def key(name):
+        return collation_key(name, LANGUAGE_COLLATION)
+
+    assert sorted(names, key=key) == sorted(
+        names, key=lambda name: [alphabet.index(c) for c in name]
+    )
+    assert sorted(["malnov-angla", "malnova"], key=key) == [
+        "malnova",
+        "malnov-angla",
+    ]
+    assert key("norvega") < key("norvega/n") < key("norvega-n")
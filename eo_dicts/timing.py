@@ -0,0 +1,88 @@
+import time
+import contextlib
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+
+class Timings:
+    """Wall time, CPU time and number of items per build phase.
+
+    Phases can be nested (also through generators with iterate()), the time
+    is always charged to the innermost running phase, so the phases add up
+    to the total time of the build."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        # name -> [wall seconds, cpu seconds, items]
+        self.phases: dict[str, list[float]] = {}
+        self.stack: list[str] = []
+        self.last_wall = time.perf_counter()
+        self.last_cpu = time.process_time()
+
+    def charge(self) -> None:
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if self.stack:
+            phase = self.phases.setdefault(self.stack[-1], [0.0, 0.0, 0])
+            phase[0] += wall - self.last_wall
+            phase[1] += cpu - self.last_cpu
+        self.last_wall = wall
+        self.last_cpu = cpu
+
+    def start(self, name: str) -> None:
+        self.charge()
+        self.stack.append(name)
+
+    def stop(self, items: int = 0) -> None:
+        self.charge()
+        name = self.stack.pop()
+        self.phases.setdefault(name, [0.0, 0.0, 0])[2] += items
+
+    @contextlib.contextmanager
+    def phase(self, name: str, items: int = 1) -> Iterator[None]:
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(items)
+
+    def iterate(self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        "Charges the time spent producing each item of `iterable` to `name`"
+        iterator = iter(iterable)
+        while True:
+            self.start(name)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.stop(0)
+                return
+            except BaseException:
+                self.stop(0)
+                raise
+            self.stop(1)
+            yield item
+
+    def merge(self, other: "Timings") -> None:
+        for name, (wall, cpu, items) in other.phases.items():
+            phase = self.phases.setdefault(name, [0.0, 0.0, 0])
+            phase[0] += wall
+            phase[1] += cpu
+            phase[2] += items
+
+    def report(self) -> dict[str, dict[str, float]]:
+        return {
+            name: {
+                "wall_s": round(wall, 6),
+                "cpu_s": round(cpu, 6),
+                "items": items,
+                "items_per_s": round(items / wall, 2) if wall else 0,
+            }
+            for name, (wall, cpu, items) in self.phases.items()
+        }
+
+
+# Timings of the running build, each worker process gets its own copy
+timings = Timings()
@@ -1,41 +1,52 @@
 import xml.etree.ElementTree as ET
 import os
-from typing import Optional, Iterator, TypeVar, Iterable
-
-T = TypeVar("T")
-
-MAPPING = {
-    "C": "Ĉ",
-    "G": "Ĝ",
-    "H": "Ĥ",
-    "J": "Ĵ",
-    "S": "Ŝ",
-    "U": "Ŭ",
-    "c": "ĉ",
-    "g": "ĝ",
-    "h": "ĥ",
-    "j": "ĵ",
-    "s": "ŝ",
-    "u": "ŭ",
-}
-
-
-def add_hats(word: str) -> str:
-    if not word or len(word) == 1:
-        return word
-    res = ""
-    pos = 0
-    while pos < len(word) - 1:
-        char = word[pos]
-        if char in MAPPING.keys() and word[pos + 1] in ("x", "X"):
-            res += MAPPING[char]
-            pos += 2
-        else:
-            res += char
-            pos += 1
-    if pos == len(word) - 1:
-        res += word[-1]
-    return res
+import sys
+import unicodedata
+from typing import Optional
+
+from .parser.letters import add_hats, letter_enumerate  # noqa: F401
+
+# The Esperanto alphabet, plus q, w, x and y where other alphabets have them
+ALPHABET = "abcĉdefgĝhĥijĵklmnopqrsŝtuŭvwxyz"
+# The letters become consecutive characters from "A" on, which keeps the keys
+# at one byte per letter. Digits and most punctuation sort before the letters
+# (so affixes like "-an" come first), the symbols whose codes the letters take
+# ([\]^_`) after them, and any other character by its code point.
+COLLATION = str.maketrans(
+    {
+        **{char: "\x7f" for char in "[\\]^_`"},
+        **{letter: chr(ord("A") + n) for n, letter in enumerate(ALPHABET)},
+    }
+)
+# Names of languages sort "/" and "-" after the letters instead, "malnova"
+# before "malnov-angla"
+LANGUAGE_COLLATION = str.maketrans(
+    {
+        **{char: "\x7f" for char in "[\\]^_`"},
+        **{letter: chr(ord("A") + n) for n, letter in enumerate(ALPHABET + "/-")},
+    }
+)
+
+
+def collation_key(word: str, collation: dict[int, str] = COLLATION) -> str:
+    "Sort key of a word in Esperanto alphabetical order, ignoring case"
+    return word.lower().translate(collation)
+
+
+def fold_key(word: str) -> str:
+    "Search key of a word: without diacritics (ĉ is c) and case"
+    decomposed = unicodedata.normalize("NFD", word)
+    return "".join(
+        char for char in decomposed if not unicodedata.combining(char)
+    ).casefold()
+
+
+def prefix_range(prefix: str) -> tuple[str, Optional[str]]:
+    """Bounds of the keys starting with prefix, `lower <= key < upper`, so the
+    search can use an index (LIKE and GLOB can't with every collation)"""
+    if not prefix or prefix[-1] == chr(sys.maxunicode):
+        return prefix, None
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
 
 
 def get_languages() -> list[dict[str, Optional[str]]]:
@@ -43,9 +54,8 @@ def get_languages() -> list[dict[str, Optional[str]]]:
     xml_path = os.path.join(base_dir, "..", "revo", "cfg", "lingvoj.xml")
     tree = ET.parse(xml_path)
     langs = tree.findall("lingvo")
-    alphabet = "abcĉdefgĝhĥijĵklmnoprsŝtuŭvz/-"
     # normal sort puts ĉ, ĝ,... at the end
-    langs = sorted(langs, key=lambda x: [alphabet.index(c) for c in (x.text or "")])
+    langs = sorted(langs, key=lambda x: collation_key(x.text or "", LANGUAGE_COLLATION))
     return [{"code": lang.get("kodo"), "name": lang.text} for lang in langs]
 
 
@@ -62,10 +72,9 @@ def list_languages() -> None:
         print(n, lang["code"], lang["name"])
 
 
-def letter_enumerate(iterable: Iterable[T]) -> Iterator[tuple[str, T]]:
-    for n, elem in enumerate(iterable):
-        yield (chr(ord("a") + n), elem)
-
-
 def output_dir() -> str:
     return os.path.join(os.path.dirname(__file__), "..", "output")
+
+
+def revo_dir() -> str:
+    return os.path.join(os.path.dirname(__file__), "..", "revo")